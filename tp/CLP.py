@@ -1,66 +1,148 @@
 """
 CLP - Cliente OPC UA + Servidor TCP/IP (VERSÃO SIMPLIFICADA)
 Duas threads:
-1. Thread OPC: lê DroneX,Y,Z e escreve TargetX,Y,Z
-2. Thread TCP: aceita 1 cliente (Supervisório) e troca dados
+1. Thread OPC: ciclo de varredura (lê DroneX,Y,Z e escreve TargetX,Y,Z)
+2. Thread TCP: servidor asyncio, aceita vários clientes (Supervisórios) e troca dados
 """
 
 import time
-import socket
+import math
+import asyncio
 import threading
+from collections import namedtuple
 from datetime import datetime
 from opcua import Client
 
+from opc_helpers import WriteSuppressor, read_values, resolve_paths
+from protocolo import empacotar_missao, empacotar_telemetria, empacotar_texto
+from scheduler import FixedRateScheduler, ScanStats
+
 OPCUA_URL = "opc.tcp://localhost:53530/OPCUA/SimulationServer"
+NOMES_VARIAVEIS = ["TargetX", "TargetY", "TargetZ", "DroneX", "DroneY", "DroneZ"]
 TCP_HOST = "0.0.0.0"
 TCP_PORT = 5000
 
+# TargetX/Y/Z: só os eixos que mudaram são escritos; um TARGET repetido é
+# reescrito se o eixo ficou HEARTBEAT_TARGET s sem escrita
+DEADBAND_TARGET = 0.0
+HEARTBEAT_TARGET = 1.0
+
+# Período do ciclo de varredura da Thread OPC (0.02 = 50 Hz)
+PERIODO_SCAN = 0.1
+
+# MISSION <tol> <dwell> x1 y1 z1 [x2 y2 z2 ...]
+MISSAO_MAX_WAYPOINTS = 100
+
+# SUBSCRIBE <hz> [ONCHANGE]: limites da taxa de push e keepalive no modo ONCHANGE
+SUBSCRIBE_HZ_MAX = 50.0
+KEEPALIVE_ONCHANGE = 1.0
+
 # variáveis compartilhadas entre as threads (considerando que em um CLP a memória é compartilhada)
+# Snapshot imutável da memória: seq cresce a cada escrita; seq_target só
+# quando chega um TARGET (é assim que a Thread OPC detecta comando novo).
+# missao é a Missao em execução (ou None) e progresso a tupla
+# (id, waypoints concluídos, total, fase) da última missão.
+Estado = namedtuple("Estado", ["seq", "drone", "target", "seq_target", "instante_target",
+                               "missao", "progresso"])
+Missao = namedtuple("Missao", ["id", "waypoints", "tol", "dwell", "instante"])
+
+# fases do progresso da missão
+INDO, AGUARDANDO, CONCLUIDA, ABORTADA = "INDO", "AGUARDANDO", "CONCLUIDA", "ABORTADA"
+
 class DadosCompartilhados:
-    """Dados compartilhados entre Thread OPC e Thread TCP"""
+    """
+    Dados compartilhados entre Thread OPC e Thread TCP.
+
+    Cada atualização monta um Estado novo e troca uma única referência
+    (atômica no CPython): leitores pegam o snapshot sem lock e sempre veem
+    drone e target consistentes entre si. O lock só serializa escritores.
+    """
     def __init__(self):
-        self.lock = threading.Lock()
-        
-        # Posição atual do drone (atualizada pela Thread OPC)
-        self.drone_x = 0.0
-        self.drone_y = 0.0
-        self.drone_z = 0.0
-        
-        # Posição alvo (recebida pela Thread TCP, enviada pela Thread OPC)
-        self.target_x = 0.0
-        self.target_y = 0.0
-        self.target_z = 1.5
-        
-        # Flag: indica se Thread TCP recebeu novo comando
-        self.novo_comando = False
+        self.lock_escrita = threading.Lock()
+        self.estado = Estado(seq=0, drone=(0.0, 0.0, 0.0), target=(0.0, 0.0, 1.5),
+                             seq_target=0, instante_target=0.0, missao=None, progresso=None)
+        self.ultimo_id_missao = 0
+
+        # Acorda a Thread OPC na hora, sem esperar o próximo ciclo
+        self.evento_comando = threading.Event()
+
+        # Motor de varredura da Thread OPC (estatísticas para o SCANSTATS)
+        self.varredura = None
     
     def atualizar_drone(self, x, y, z):
         """Thread OPC chama isso após ler do Prosys"""
-        with self.lock:
-            self.drone_x = x
-            self.drone_y = y
-            self.drone_z = z
-    
-    def obter_drone(self):
-        """Thread TCP chama isso para enviar ao Supervisório"""
-        with self.lock:
-            return (self.drone_x, self.drone_y, self.drone_z)
+        with self.lock_escrita:
+            atual = self.estado
+            self.estado = atual._replace(seq=atual.seq + 1, drone=(x, y, z))
     
     def definir_target(self, x, y, z):
-        """Thread TCP chama isso quando recebe comando do Supervisório"""
-        with self.lock:
-            self.target_x = x
-            self.target_y = y
-            self.target_z = z
-            self.novo_comando = True
-    
-    def obter_target(self):
-        """Thread OPC chama isso para enviar ao Prosys"""
-        with self.lock:
-            target = (self.target_x, self.target_y, self.target_z)
-            tem_novo = self.novo_comando
-            self.novo_comando = False
-            return target, tem_novo
+        """Thread TCP chama isso quando recebe comando do Supervisório (cancela a missão)"""
+        with self.lock_escrita:
+            atual = self.estado
+            self.estado = atual._replace(
+                seq=atual.seq + 1, target=(x, y, z),
+                seq_target=atual.seq_target + 1, instante_target=time.perf_counter(),
+                missao=None, progresso=self._progresso_abortado(atual),
+            )
+        self.evento_comando.set()
+
+    @staticmethod
+    def _progresso_abortado(atual):
+        if atual.missao is None:
+            return atual.progresso
+        _, concluidos, total, _ = atual.progresso
+        return (atual.missao.id, concluidos, total, ABORTADA)
+
+    def definir_missao(self, waypoints, tol, dwell):
+        """Thread TCP: nova missão (substitui a atual); a Thread OPC sequencia"""
+        with self.lock_escrita:
+            self.ultimo_id_missao += 1
+            missao = Missao(self.ultimo_id_missao, tuple(waypoints), tol, dwell,
+                            time.perf_counter())
+            atual = self.estado
+            self.estado = atual._replace(
+                seq=atual.seq + 1, missao=missao,
+                progresso=(missao.id, 0, len(missao.waypoints), INDO),
+            )
+        self.evento_comando.set()
+        return missao.id
+
+    def abortar_missao(self):
+        """Thread TCP: MISSION ABORT; o drone fica no waypoint para onde ia"""
+        with self.lock_escrita:
+            atual = self.estado
+            if atual.missao is None:
+                return False
+            self.estado = atual._replace(seq=atual.seq + 1, missao=None,
+                                         progresso=self._progresso_abortado(atual))
+        return True
+
+    def atualizar_missao(self, id_missao, target, progresso):
+        """
+        Thread OPC: publica o waypoint corrente (target, ou None para manter) e
+        o progresso. Ignorado se a missão foi cancelada nesse meio-tempo.
+        """
+        with self.lock_escrita:
+            atual = self.estado
+            if atual.missao is None or atual.missao.id != id_missao:
+                return False
+            self.estado = atual._replace(
+                seq=atual.seq + 1,
+                target=target if target is not None else atual.target,
+                missao=None if progresso[3] == CONCLUIDA else atual.missao,
+                progresso=progresso,
+            )
+        return True
+
+    def obter_estado(self):
+        """Snapshot atual (sem lock; nunca muda depois de publicado)"""
+        return self.estado
+
+    def obter_drone(self):
+        return self.estado.drone
+
+    def ler_target(self):
+        return self.estado.target
 
 class CLP:
     def __init__(self, url=OPCUA_URL):
@@ -72,6 +154,7 @@ class CLP:
         self.drone_x_node = None
         self.drone_y_node = None
         self.drone_z_node = None
+        self.target_writer = None
     
     def connect(self):
         """Conecta ao servidor OPC UA e mapeia as variáveis"""
@@ -81,94 +164,202 @@ class CLP:
         self.client.connect()
         print("[CLP-OPC] Conectado!")
         
-        root = self.client.get_objects_node()
-        
-        # Achar pasta Drone
-        drone_folder = None
-        try:
-            drone_folder = root.get_child(["3:Drone"])
-        except:
-            for node in root.get_children():
-                try:
-                    name = node.get_browse_name().Name
-                    if name.lower() == "drone":
-                        drone_folder = node
-                        break
-                except:
-                    pass
-        
-        if drone_folder is None:
-            raise RuntimeError("Pasta 'Drone' não encontrada")
-        
-        # Mapear variáveis
-        name_to_node = {}
-        for var in drone_folder.get_children():
-            try:
-                var_name = var.get_browse_name().Name
-                name_to_node[var_name.lower()] = var
-            except:
-                pass
-        
-        self.target_x_node = name_to_node.get("targetx")
-        self.target_y_node = name_to_node.get("targety")
-        self.target_z_node = name_to_node.get("targetz")
-        self.drone_x_node = name_to_node.get("dronex")
-        self.drone_y_node = name_to_node.get("droney")
-        self.drone_z_node = name_to_node.get("dronez")
-        
-        if not all([self.target_x_node, self.target_y_node, self.target_z_node,
-                    self.drone_x_node, self.drone_y_node, self.drone_z_node]):
-            raise RuntimeError("Variáveis não encontradas")
+        (self.target_x_node, self.target_y_node, self.target_z_node,
+         self.drone_x_node, self.drone_y_node, self.drone_z_node) = resolve_paths(
+            self.client, self.url, [["Drone", nome] for nome in NOMES_VARIAVEIS]
+        )
+        self.target_writer = WriteSuppressor(
+            [self.target_x_node, self.target_y_node, self.target_z_node],
+            DEADBAND_TARGET, HEARTBEAT_TARGET,
+        )
         
         print("[CLP-OPC] Variáveis mapeadas!")
 
         # Escrever valores iniciais (senao o drone pega o último target salvo)
         print("[CLP-OPC] Inicializando targets com posição segura (0, 0, 1.5)...")
-        self.enviar_target(0.0, 0.0, 1.5)
+        self.enviar_target(0.0, 0.0, 1.5, forcar=True)
         print("[CLP-OPC] Targets inicializados!")
     
     def ler_posicao_drone(self):
-        """Lê posição atual do drone do Prosys"""
-        x = float(self.drone_x_node.get_value())
-        y = float(self.drone_y_node.get_value())
-        z = float(self.drone_z_node.get_value())
-        return (x, y, z)
+        """Lê posição atual do drone do Prosys (um único Read)"""
+        x, y, z = read_values([self.drone_x_node, self.drone_y_node, self.drone_z_node])
+        return (float(x), float(y), float(z))
     
-    def enviar_target(self, x, y, z):
-        """Envia target ao Prosys"""
-        self.target_x_node.set_value(float(x))
-        self.target_y_node.set_value(float(y))
-        self.target_z_node.set_value(float(z))
+    def enviar_target(self, x, y, z, forcar=False):
+        """Envia ao Prosys só os eixos do target que mudaram (um único Write)"""
+        return self.target_writer.write([x, y, z], force=forcar)
     
     def disconnect(self):
         if self.client:
             self.client.disconnect()
 
 # THREAD 1: Cliente OPC
+class MotorVarredura:
+    """
+    Ciclo de varredura com período fixo (deadline absoluto), como num CLP:
+    1. entradas: lê DroneX,Y,Z do Prosys para a imagem de entradas
+    2. lógica: decide a imagem de saídas a partir das entradas e dos comandos
+    3. saídas: escreve TargetX,Y,Z no Prosys se houver saída a escrever
+    Cada fase e o ciclo inteiro são cronometrados.
+
+    Um TARGET não espera o próximo ciclo: o evento_comando acorda a espera
+    entre ciclos, lógica e saídas rodam na hora (despachar_comando) e o
+    ciclo continua no mesmo deadline. "comando" mede TARGET -> Write.
+
+    Missões também rodam na lógica: o target vai para o próximo waypoint
+    depois que o drone fica dwell segundos a menos de tol do atual.
+    """
+    FASES = ("ciclo", "entradas", "logica", "saidas", "comando")
+
+    def __init__(self, clp, dados, periodo=PERIODO_SCAN):
+        self.clp = clp
+        self.dados = dados
+        self.periodo = periodo
+        self.sched = FixedRateScheduler(periodo)
+        self.stats = {fase: ScanStats() for fase in self.FASES}
+
+        self.entradas = None   # posição do drone lida neste ciclo
+        self.saidas = None     # target a escrever neste ciclo (None = nada)
+        self.seq_aplicado = dados.obter_estado().seq_target
+        self.instante_comando = None
+
+        # execução da missão: id, waypoint atual e instante de chegada nele
+        self.id_missao = None
+        self.indice = 0
+        self.chegada = None
+
+    def ler_entradas(self):
+        self.entradas = self.clp.ler_posicao_drone()
+        self.dados.atualizar_drone(*self.entradas)
+
+    def logica(self):
+        estado = self.dados.obter_estado()
+        self.saidas = None
+        self.instante_comando = None
+
+        if estado.seq_target != self.seq_aplicado:
+            self.saidas = estado.target
+            self.seq_aplicado = estado.seq_target
+            self.instante_comando = estado.instante_target
+
+        if estado.missao is None:
+            self.id_missao = None
+        else:
+            self.executar_missao(estado.missao)
+
+    def publicar_missao(self, missao, fase, novo_waypoint=False, instante=None):
+        """Publica o progresso e, ao trocar de waypoint, o novo target como saída"""
+        total = len(missao.waypoints)
+        target = None
+        if novo_waypoint and self.indice < total:
+            target = missao.waypoints[self.indice]
+        progresso = (missao.id, self.indice, total, fase)
+        if self.dados.atualizar_missao(missao.id, target, progresso) and target is not None:
+            self.saidas = target
+            self.instante_comando = instante
+
+    def executar_missao(self, missao):
+        if self.id_missao != missao.id:
+            self.id_missao = missao.id
+            self.indice = 0
+            self.chegada = None
+            print(f"[CLP-OPC] Missão {missao.id}: {len(missao.waypoints)} waypoints")
+            self.publicar_missao(missao, INDO, novo_waypoint=True, instante=missao.instante)
+            return
+
+        if self.entradas is None:
+            return
+        perto = math.dist(self.entradas, missao.waypoints[self.indice]) <= missao.tol
+
+        if not perto:
+            if self.chegada is not None:
+                # saiu da tolerância durante o dwell: volta a contar na chegada
+                self.chegada = None
+                self.publicar_missao(missao, INDO)
+            return
+
+        agora = time.monotonic()
+        if self.chegada is None:
+            self.chegada = agora
+            self.publicar_missao(missao, AGUARDANDO)
+            return
+        if agora - self.chegada < missao.dwell:
+            return
+
+        self.indice += 1
+        self.chegada = None
+        if self.indice == len(missao.waypoints):
+            print(f"[CLP-OPC] Missão {missao.id} concluída")
+            self.publicar_missao(missao, CONCLUIDA)
+        else:
+            self.publicar_missao(missao, INDO, novo_waypoint=True)
+
+    def escrever_saidas(self):
+        if self.saidas is None:
+            return
+        # target igual ao último escrito: nada foi ao Prosys, nada a registrar
+        if not self.clp.enviar_target(*self.saidas):
+            return
+        if self.instante_comando is not None:
+            self.stats["comando"].record(time.perf_counter() - self.instante_comando)
+        x, y, z = self.saidas
+        print(f"[CLP-OPC] Target enviado: ({x:.2f}, {y:.2f}, {z:.2f})")
+
+    def varrer(self):
+        """Um ciclo completo, registrando o tempo de cada fase"""
+        t0 = time.perf_counter()
+        self.ler_entradas()
+        t1 = time.perf_counter()
+        self.logica()
+        t2 = time.perf_counter()
+        self.escrever_saidas()
+        t3 = time.perf_counter()
+
+        self.stats["entradas"].record(t1 - t0)
+        self.stats["logica"].record(t2 - t1)
+        self.stats["saidas"].record(t3 - t2)
+        self.stats["ciclo"].record(t3 - t0)
+
+    def despachar_comando(self):
+        """Fora do ciclo: lógica e saídas assim que chega um comando"""
+        self.logica()
+        self.escrever_saidas()
+
+    def rodar(self, stop_event):
+        self.sched.start()
+        while not stop_event.is_set():
+            self.varrer()
+            while self.sched.wait(self.dados.evento_comando) is None:
+                self.despachar_comando()
+
+    def resumo(self):
+        """
+        Linha do SCANSTATS (tempos em ms; cada fase com min avg max p99):
+        SCANSTATS PERIODO p CICLOS n OVERRUNS k CICLO ... ENTRADAS ... LOGICA ... SAIDAS ...
+        """
+        partes = [f"SCANSTATS PERIODO {self.periodo * 1000:.1f}",
+                  f"CICLOS {self.stats['ciclo'].count}",
+                  f"OVERRUNS {self.sched.overruns}"]
+        for fase in self.FASES:
+            _, minimo, media, maximo, p99 = self.stats[fase].snapshot()
+            partes.append(f"{fase.upper()} {minimo * 1000:.2f} {media * 1000:.2f} "
+                          f"{maximo * 1000:.2f} {p99 * 1000:.2f}")
+        return " ".join(partes)
+
 def thread_opc(dados, stop_event):
     """
-    Thread que gerencia comunicação OPC UA
-    - Lê DroneX,Y,Z do Prosys (10 Hz)
-    - Escreve TargetX,Y,Z no Prosys quando há novo comando
+    Thread que gerencia comunicação OPC UA pelo ciclo de varredura
+    (PERIODO_SCAN): lê DroneX,Y,Z do Prosys a cada ciclo e escreve
+    TargetX,Y,Z quando há novo comando
     """
     clp = CLP()
     
     try:
         clp.connect()
-        print("[CLP-OPC] Thread iniciada\n")
-        
-        while not stop_event.is_set():
-            # 1. Ler posição do drone do Prosys
-            pos = clp.ler_posicao_drone()
-            dados.atualizar_drone(pos[0], pos[1], pos[2])
-            
-            # 2. Verificar se há novo target (vindo do TCP)
-            target, tem_novo = dados.obter_target()
-            if tem_novo:
-                clp.enviar_target(target[0], target[1], target[2])
-                print(f"[CLP-OPC] Target enviado: ({target[0]:.2f}, {target[1]:.2f}, {target[2]:.2f})")
-            
-            time.sleep(0.1)  # 10 Hz
+        motor = MotorVarredura(clp, dados, PERIODO_SCAN)
+        dados.varredura = motor
+        print(f"[CLP-OPC] Thread iniciada (ciclo de {PERIODO_SCAN * 1000:.0f} ms)\n")
+        motor.rodar(stop_event)
     
     except Exception as e:
         print(f"[CLP-OPC] ERRO: {e}")
@@ -177,96 +368,285 @@ def thread_opc(dados, stop_event):
         print("[CLP-OPC] Thread encerrada")
 
 # THREAD 2: Servidor TCP
-def thread_tcp(dados, stop_event):
+def formatar_status(drone_pos, target_pos, progresso=None):
     """
-    Thread que gerencia servidor TCP/IP
-    - Aceita 1 cliente (Supervisório)
-    - Recebe comandos TARGET
-    - Envia telemetria STATUS
+    Linha de telemetria usada tanto no STATUS quanto no SUBSCRIBE; com
+    missão termina em "MISSION <id> <concluídos>/<total> <fase>"
     """
+    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    missao = ""
+    if progresso is not None:
+        id_missao, concluidos, total, fase = progresso
+        missao = f" MISSION {id_missao} {concluidos}/{total} {fase}"
+    return (
+        f"DRONE {drone_pos[0]:.3f} {drone_pos[1]:.3f} {drone_pos[2]:.3f} "
+        f"TARGET {target_pos[0]:.3f} {target_pos[1]:.3f} {target_pos[2]:.3f} "
+        f"TIME {timestamp}{missao}\n"
+    )
+
+class SessaoCliente:
+    """Estado de uma conexão TCP: formato negociado e task de push do SUBSCRIBE"""
+    def __init__(self, writer):
+        self.writer = writer
+        self.binario = False
+        self.push = None
+
+    def enviar_texto(self, texto):
+        """Resposta a comando; em modo binário vai como frame de texto"""
+        if self.binario:
+            self.writer.write(empacotar_texto(texto))
+        else:
+            self.writer.write(f"{texto}\n".encode('utf-8'))
+
+    def enviar_status(self, drone_pos, target_pos, progresso=None):
+        """
+        Telemetria: linha DRONE/TARGET/TIME[/MISSION] ou frame binário de 7
+        doubles, seguido do frame de missão quando há progresso
+        """
+        if self.binario:
+            self.writer.write(empacotar_telemetria(drone_pos, target_pos, time.time()))
+            if progresso is not None:
+                self.writer.write(empacotar_missao(progresso))
+        else:
+            self.writer.write(formatar_status(drone_pos, target_pos, progresso).encode('utf-8'))
+
+    def cancelar_push(self):
+        if self.push is not None:
+            self.push.cancel()
+            self.push = None
+
+def processar_comando(dados, comando, sessao):
+    """
+    Interpreta um comando do cliente, responde pela sessão e indica se deve fechar
+    """
+    partes = comando.split()
+
+    if partes[0].upper() == "TARGET" and len(partes) == 4:
+        # Supervisório enviou: TARGET x y z
+        try:
+            x = float(partes[1])
+            y = float(partes[2])
+            z = float(partes[3])
+        except ValueError:
+            sessao.enviar_texto("ERRO: coordenadas inválidas")
+            return False
+
+        dados.definir_target(x, y, z)
+        sessao.enviar_texto(f"OK TARGET {x:.2f} {y:.2f} {z:.2f}")
+
+    elif partes[0].upper() == "STATUS":
+        # Supervisório pediu: STATUS
+        estado = dados.obter_estado()
+        sessao.enviar_status(estado.drone, estado.target, estado.progresso)
+
+    elif partes[0].upper() == "MISSION":
+        iniciar_missao(dados, sessao, partes)
+
+    elif partes[0].upper() == "SCANSTATS":
+        if dados.varredura is None:
+            sessao.enviar_texto("ERRO: varredura não iniciada")
+        else:
+            sessao.enviar_texto(dados.varredura.resumo())
+
+    elif partes[0].upper() in ("SUBSCRIBE", "UNSUBSCRIBE"):
+        iniciar_subscribe(dados, sessao, partes)
+
+    elif partes[0].upper() == "FORMATO" and len(partes) == 2:
+        # FORMATO BIN | FORMATO TEXTO; a confirmação ainda sai no formato antigo
+        formato = partes[1].upper()
+        if formato not in ("BIN", "TEXTO"):
+            sessao.enviar_texto("ERRO: formato deve ser BIN ou TEXTO")
+            return False
+        sessao.enviar_texto(f"OK FORMATO {formato}")
+        sessao.binario = formato == "BIN"
+
+    elif partes[0].upper() == "QUIT":
+        sessao.enviar_texto("TCHAU")
+        return True
+
+    else:
+        sessao.enviar_texto("ERRO: comando desconhecido")
+
+    return False
+
+async def enviar_telemetria(dados, sessao, hz, so_mudanca):
+    """
+    Task de push do SUBSCRIBE: envia a telemetria a cada 1/hz s, ou só
+    quando drone/target mudam (com keepalive) se so_mudanca.
+    """
+    loop = asyncio.get_running_loop()
+    periodo = 1.0 / hz
+    proximo = loop.time()
+    ultimo = None
+    ultimo_envio = 0.0
+
+    while True:
+        agora = loop.time()
+        estado = dados.obter_estado()
+        atual = (estado.drone, estado.target, estado.progresso)
+
+        if (not so_mudanca or atual != ultimo
+                or agora - ultimo_envio >= KEEPALIVE_ONCHANGE):
+            sessao.enviar_status(*atual)
+            await sessao.writer.drain()
+            ultimo = atual
+            ultimo_envio = agora
+
+        proximo += periodo
+        await asyncio.sleep(max(0.0, proximo - loop.time()))
+
+def iniciar_missao(dados, sessao, partes):
+    """
+    MISSION <tol> <dwell> x1 y1 z1 [x2 y2 z2 ...]: envia todos os waypoints de
+    uma vez (tol em m, dwell em s); MISSION ABORT cancela. Um TARGET também
+    cancela a missão em andamento.
+    """
+    if len(partes) == 2 and partes[1].upper() == "ABORT":
+        if dados.abortar_missao():
+            sessao.enviar_texto("OK MISSION ABORT")
+        else:
+            sessao.enviar_texto("ERRO: nenhuma missão em andamento")
+        return
+
+    uso = "ERRO: uso MISSION <tol> <dwell> x1 y1 z1 [x2 y2 z2 ...] | MISSION ABORT"
+    coords = partes[3:]
+    if not coords or len(coords) % 3 != 0:
+        sessao.enviar_texto(uso)
+        return
     try:
-        # Criar servidor TCP
-        servidor = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        servidor.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-        servidor.bind((TCP_HOST, TCP_PORT))
-        servidor.listen(1)  # Aceita apenas 1 cliente
-        servidor.settimeout(1.0)
-        
-        print(f"[CLP-TCP] Servidor escutando em {TCP_HOST}:{TCP_PORT}")
-        print(f"[CLP-TCP] Aguardando Supervisório conectar...\n")
-        
-        conn = None
-        
-        while not stop_event.is_set():
-            # Aceitar conexão do Supervisório
-            if conn is None:
-                try:
-                    conn, addr = servidor.accept()
-                    print(f"[CLP-TCP] Supervisório conectado: {addr}")
-                    conn.sendall(b"CLP PRONTO\n")
-                except socket.timeout:
-                    continue
-            
-            # Processar comandos do Supervisório
+        tol = float(partes[1])
+        dwell = float(partes[2])
+        valores = [float(c) for c in coords]
+    except (IndexError, ValueError):
+        sessao.enviar_texto(uso)
+        return
+
+    # nan/inf passariam pelas comparações e a missão nunca terminaria
+    if not all(math.isfinite(v) for v in [tol, dwell] + valores):
+        sessao.enviar_texto("ERRO: valores devem ser finitos")
+        return
+    if tol <= 0 or dwell < 0:
+        sessao.enviar_texto("ERRO: tol deve ser > 0 e dwell >= 0")
+        return
+    waypoints = [tuple(valores[i:i + 3]) for i in range(0, len(valores), 3)]
+    if len(waypoints) > MISSAO_MAX_WAYPOINTS:
+        sessao.enviar_texto(f"ERRO: no máximo {MISSAO_MAX_WAYPOINTS} waypoints")
+        return
+
+    id_missao = dados.definir_missao(waypoints, tol, dwell)
+    sessao.enviar_texto(f"OK MISSION {id_missao} {len(waypoints)}")
+
+def iniciar_subscribe(dados, sessao, partes):
+    """Trata SUBSCRIBE <hz> [ONCHANGE] / UNSUBSCRIBE, trocando a task de push da sessão"""
+    sessao.cancelar_push()
+
+    if partes[0].upper() == "UNSUBSCRIBE":
+        sessao.enviar_texto("OK UNSUBSCRIBE")
+        return
+
+    try:
+        hz = float(partes[1])
+    except (IndexError, ValueError):
+        sessao.enviar_texto("ERRO: uso SUBSCRIBE <hz> [ONCHANGE]")
+        return
+    if not 0 < hz <= SUBSCRIBE_HZ_MAX:
+        sessao.enviar_texto(f"ERRO: taxa deve estar em (0, {SUBSCRIBE_HZ_MAX:g}] Hz")
+        return
+
+    so_mudanca = len(partes) > 2 and partes[2].upper() == "ONCHANGE"
+    modo = " ONCHANGE" if so_mudanca else ""
+    sessao.enviar_texto(f"OK SUBSCRIBE {hz:g}{modo}")
+    sessao.push = asyncio.ensure_future(enviar_telemetria(dados, sessao, hz, so_mudanca))
+
+async def atender_cliente(dados, reader, writer):
+    """Task de um cliente: lê comandos linha a linha e responde"""
+    addr = writer.get_extra_info("peername")
+    print(f"[CLP-TCP] Cliente conectado: {addr}")
+    sessao = SessaoCliente(writer)
+
+    try:
+        writer.write(b"CLP PRONTO\n")
+        await writer.drain()
+
+        while True:
+            try:
+                data = await reader.readline()
+            except ValueError:
+                # linha maior que o limite do StreamReader: o resto dela
+                # chegaria como comando, então a conexão é encerrada
+                print(f"[CLP-TCP] Linha longa demais de {addr}, encerrando")
+                sessao.enviar_texto("ERRO: linha longa demais")
+                await writer.drain()
+                break
+            if not data:
+                print(f"[CLP-TCP] Cliente {addr} desconectou")
+                break
+
             try:
-                conn.settimeout(0.5)
-                data = conn.recv(1024)
-                
-                if not data:
-                    print("[CLP-TCP] Supervisório desconectou")
-                    conn.close()
-                    conn = None
-                    continue
-                
                 comando = data.decode('utf-8').strip()
-                print(f"[CLP-TCP] Comando: {comando}")
-                
-                partes = comando.split()
-                
-                if partes[0].upper() == "TARGET" and len(partes) == 4:
-                    # Supervisório enviou: TARGET x y z
-                    x = float(partes[1])
-                    y = float(partes[2])
-                    z = float(partes[3])
-                    
-                    dados.definir_target(x, y, z)
-                    resposta = f"OK TARGET {x:.2f} {y:.2f} {z:.2f}\n"
-                    conn.sendall(resposta.encode('utf-8'))
-                
-                elif partes[0].upper() == "STATUS":
-                    # Supervisório pediu: STATUS
-                    drone_pos = dados.obter_drone()
-                    target_pos, _ = dados.obter_target()
-                    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-                    
-                    resposta = (
-                        f"DRONE {drone_pos[0]:.3f} {drone_pos[1]:.3f} {drone_pos[2]:.3f} "
-                        f"TARGET {target_pos[0]:.3f} {target_pos[1]:.3f} {target_pos[2]:.3f} "
-                        f"TIME {timestamp}\n"
-                    )
-                    conn.sendall(resposta.encode('utf-8'))
-                
-                elif partes[0].upper() == "QUIT":
-                    conn.sendall(b"TCHAU\n")
-                    conn.close()
-                    conn = None
-                
-                else:
-                    conn.sendall(b"ERRO: comando desconhecido\n")
-            
-            except socket.timeout:
+            except UnicodeDecodeError:
+                sessao.enviar_texto("ERRO: comando não é UTF-8")
+                await writer.drain()
                 continue
-            except Exception as e:
-                print(f"[CLP-TCP] Erro: {e}")
-                if conn:
-                    conn.close()
-                    conn = None
-        
-        if conn:
-            conn.close()
+            if not comando:
+                continue
+            print(f"[CLP-TCP] Comando de {addr}: {comando}")
+
+            fechar = processar_comando(dados, comando, sessao)
+            await writer.drain()
+
+            if fechar:
+                break
+
+    except (ConnectionError, asyncio.IncompleteReadError) as e:
+        print(f"[CLP-TCP] Erro com {addr}: {e}")
+    except Exception as e:
+        # ninguém aguarda a task do cliente: sem isso o erro some num
+        # "Task exception was never retrieved"
+        print(f"[CLP-TCP] Erro inesperado com {addr}: {e!r}")
+    finally:
+        sessao.cancelar_push()
+        writer.close()
+        try:
+            await writer.wait_closed()
+        except Exception:
+            pass
+
+async def servidor_tcp(dados, stop_event):
+    """Servidor asyncio: uma task por cliente, até stop_event ser setado"""
+    tarefas = set()
+
+    def nova_conexao(reader, writer):
+        tarefa = asyncio.ensure_future(atender_cliente(dados, reader, writer))
+        tarefas.add(tarefa)
+        tarefa.add_done_callback(tarefas.discard)
+
+    servidor = await asyncio.start_server(nova_conexao, TCP_HOST, TCP_PORT,
+                                          reuse_address=True)
+
+    print(f"[CLP-TCP] Servidor escutando em {TCP_HOST}:{TCP_PORT}")
+    print(f"[CLP-TCP] Aguardando clientes (vários simultâneos)...\n")
+
+    async with servidor:
+        while not stop_event.is_set():
+            await asyncio.sleep(0.5)
+
         servidor.close()
+        for tarefa in list(tarefas):
+            tarefa.cancel()
+        await asyncio.gather(*tarefas, return_exceptions=True)
+
+def thread_tcp(dados, stop_event):
+    """
+    Thread que gerencia servidor TCP/IP (asyncio)
+    - Aceita vários clientes ao mesmo tempo (supervisórios, loggers, diagnóstico)
+    - Recebe comandos TARGET
+    - Envia telemetria STATUS (sob pedido) ou SUBSCRIBE (push periódico)
+    """
+    try:
+        asyncio.run(servidor_tcp(dados, stop_event))
         print("[CLP-TCP] Thread encerrada")
-    
+
     except Exception as e:
         print(f"[CLP-TCP] ERRO FATAL: {e}")
 
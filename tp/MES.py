@@ -1,9 +1,56 @@
 # mes.py
-from datetime import datetime
+from datetime import datetime, timedelta, timezone
 from opcua import Client
+import os
+import threading
 import time
 
+from compressao import Deadband, PortaGiratoria
+from historiador import Historiador
+from kpi import AgregadorKPI
+from opc_helpers import read_values, resolve_paths
+from scheduler import FixedRateScheduler
+from serie_temporal import EscritorSerie
+
 CHAINED_ENDPOINT = "opc.tcp://localhost:54000/OPCUA/ChainedServer"
+CHAINED_NAMESPACE = "http://ufmg.br/drone/ChainedServer"
+
+# Amostragem: polling a cada PERIODO_AMOSTRAGEM ou, com USE_SUBSCRIPTION,
+# uma amostra por notificação do servidor encadeado (pega manobras rápidas)
+PERIODO_AMOSTRAGEM = 1.0              # segundos
+USE_SUBSCRIPTION = False
+PUBLISH_INTERVAL_MS = 50
+
+# Gravação por evento: só grava quando algum canal muda mais que DEADBAND
+# (metros) desde a última linha gravada, ou a cada HEARTBEAT segundos.
+# DEADBAND = None grava todas as amostras.
+DEADBAND = 0.01
+HEARTBEAT = 30.0
+# Swinging door: com a mesma tolerância (DEADBAND), grava só os pontos
+# necessários para reconstruir a trajetória por interpolação linear
+SWINGING_DOOR = False
+
+# Backfill: ao iniciar, lê do histórico do servidor encadeado (Historical
+# Access) o que aconteceu desde a última amostra gravada (da série ou, sem
+# série, da última linha do mes.txt), no máximo BACKFILL_MAX_S segundos
+# atrás. Sem série e sem linhas no mes.txt o backfill é pulado. None desliga.
+BACKFILL_MAX_S = 3600.0
+
+# Gravação de mes.txt: buffer em memória, flush periódico e rotação
+ARQUIVO_MES = "mes.txt"
+INTERVALO_FLUSH = 5.0                 # segundos
+ROTACAO_MAX_BYTES = 50 * 1024 * 1024  # None desliga a rotação por tamanho
+ROTACAO_DIARIA = True
+COMPRIMIR_SEGMENTOS = True            # segmentos fechados viram .gz
+
+# Série temporal binária com as mesmas amostras (None desliga)
+SERIE_MES = "mes_serie"
+CANAIS_MES = ["DroneX", "DroneY", "DroneZ", "TargetX", "TargetY", "TargetZ"]
+
+# KPIs incrementais por minuto e por turno (None desliga)
+ARQUIVO_KPI = "mes_kpi.json"
+TURNO_HORAS = 8
+TURNO_INICIO_H = 6                    # turnos 06-14, 14-22, 22-06
 
 def connect_chained_server(url=CHAINED_ENDPOINT):
     """
@@ -14,88 +61,239 @@ def connect_chained_server(url=CHAINED_ENDPOINT):
     client.connect()
     print("[MES] Conectado ao servidor encadeado")
 
-    root = client.get_objects_node()
+    nodes = resolve_paths(
+        client, url, [["Drone", nome] for nome in CANAIS_MES], namespace=CHAINED_NAMESPACE
+    )
 
-    drone_folder = None
-    for node in root.get_children():
-        try:
-            if node.get_browse_name().Name.lower() == "drone":
-                drone_folder = node
-                break
-        except:
-            pass
+    print("[MES] Variáveis mapeadas com sucesso")
+    return client, tuple(nodes)
+
+
+class AmostraHandler:
+    """
+    Handler da subscription: guarda o último valor de cada nó e acorda o laço
+    principal quando chega dado novo.
+    """
+    def __init__(self, nodes):
+        self.indice = {node.nodeid: i for i, node in enumerate(nodes)}
+        self.valores = [None] * len(nodes)
+        self.lock = threading.Lock()
+        self.novo = threading.Event()
+
+    def datachange_notification(self, node, val, data):
+        i = self.indice.get(node.nodeid)
+        if i is None:
+            return
+        with self.lock:
+            self.valores[i] = float(val)
+        self.novo.set()
+
+    def status_change_notification(self, status):
+        print(f"[MES] Status da subscription alterado: {status}")
+
+    def esperar(self, timeout):
+        """Espera dado novo (ou o timeout) e retorna os valores; None se ainda faltar algum"""
+        self.novo.wait(timeout)
+        self.novo.clear()
+        with self.lock:
+            if None in self.valores:
+                return None
+            return tuple(self.valores)
+
+
+def ler_historico(nodes, inicio, fim):
+    """
+    Lê o histórico dos nós entre inicio e fim (datetimes UTC, como o servidor
+    guarda) e monta linhas (t epoch, valores) com o último valor de cada canal
+    em cada instante. As linhas começam quando todos os canais são conhecidos;
+    canal sem mudança no intervalo ficou constante, então vale o valor atual.
+    """
+    eventos = []
+    for i, node in enumerate(nodes):
+        for dv in node.read_raw_history(inicio, fim):
+            ts = dv.SourceTimestamp or dv.ServerTimestamp
+            t = ts.replace(tzinfo=timezone.utc).timestamp()
+            eventos.append((t, i, float(dv.Value.Value)))
 
-    if drone_folder is None:
-        raise RuntimeError("Objeto 'Drone' não encontrado no servidor encadeado")
+    valores = [None] * len(nodes)
+    com_evento = {i for _, i, _ in eventos}
+    sem_evento = [i for i in range(len(nodes)) if i not in com_evento]
+    if sem_evento:
+        atuais = read_values([nodes[i] for i in sem_evento])
+        for i, v in zip(sem_evento, atuais):
+            valores[i] = float(v)
 
-    name_to_node = {}
-    for var in drone_folder.get_children():
+    linhas = []
+    for t, i, v in sorted(eventos):
+        valores[i] = v
+        if None in valores:
+            continue
+        if linhas and linhas[-1][0] == t:
+            linhas[-1] = (t, tuple(valores))
+        else:
+            linhas.append((t, tuple(valores)))
+    return linhas
+
+
+def ultimo_t_arquivo(caminho):
+    """
+    Timestamp (epoch) da última linha de mes.txt, ou None se não houver.
+    A linha trunca o timestamp em milissegundos, então devolve o fim desse
+    milissegundo (a amostra da linha não volta no backfill).
+    """
+    try:
+        with open(caminho, "rb") as f:
+            f.seek(0, os.SEEK_END)
+            f.seek(max(0, f.tell() - 4096))
+            linhas = f.read().decode("utf-8", errors="replace").splitlines()
+    except OSError:
+        return None
+    for linha in reversed(linhas):
         try:
-            nm = var.get_browse_name().Name
-            name_to_node[nm.lower()] = var
-        except:
-            pass
+            return datetime.strptime(linha[:23], "%Y-%m-%d %H:%M:%S.%f").timestamp() + 0.001
+        except ValueError:
+            continue
+    return None
 
-    dX = name_to_node.get("dronex")
-    dY = name_to_node.get("droney")
-    dZ = name_to_node.get("dronez")
-    tX = name_to_node.get("targetx")
-    tY = name_to_node.get("targety")
-    tZ = name_to_node.get("targetz")
 
-    if not all([dX, dY, dZ, tX, tY, tZ]):
-        found = ", ".join(sorted(name_to_node.keys()))
-        raise RuntimeError(
-            "Variáveis esperadas não encontradas: "
-            f"DroneX, DroneY, DroneZ, TargetX, TargetY, TargetZ. Encontradas: {found}"
-        )
+def gravar_amostra(historiador, serie, t, valores):
+    drone_x, drone_y, drone_z, target_x, target_y, target_z = valores
+    timestamp = datetime.fromtimestamp(t).strftime("%Y-%m-%d %H:%M:%S.%f")[:-3]
 
-    print("[MES] Variáveis mapeadas com sucesso")
-    return client, (dX, dY, dZ, tX, tY, tZ)
+    linha = (
+        f"{timestamp}; "
+        f"DRONE_X={drone_x:.3f}; DRONE_Y={drone_y:.3f}; DRONE_Z={drone_z:.3f}; "
+        f"TARGET_X={target_x:.3f}; TARGET_Y={target_y:.3f}; TARGET_Z={target_z:.3f}"
+    )
+
+    historiador.escrever(linha)
+    if serie is not None:
+        serie.escrever(t, valores)
+
+    print("[MES]", linha)
 
 
 def main():
     """
-    Lê drone/target periodicamente do servidor e salva em mes.txt.
+    Amostra drone/target do servidor e grava em mes.txt as amostras que
+    passam pelo deadband (ou todas, com DEADBAND = None).
     """
-    client, (dX, dY, dZ, tX, tY, tZ) = connect_chained_server()
-    print("[MES] Iniciando leitura periódica (Ctrl+C para sair)")
+    client, nodes = connect_chained_server()
+    historiador = Historiador(
+        ARQUIVO_MES,
+        intervalo_flush=INTERVALO_FLUSH,
+        max_bytes=ROTACAO_MAX_BYTES,
+        rotacao_diaria=ROTACAO_DIARIA,
+        comprimir=COMPRIMIR_SEGMENTOS,
+    )
+    serie = EscritorSerie(SERIE_MES, CANAIS_MES) if SERIE_MES else None
+    kpi = AgregadorKPI(ARQUIVO_KPI, TURNO_HORAS, TURNO_INICIO_H) if ARQUIVO_KPI else None
+    filtro = None
+    if DEADBAND is not None:
+        tipo = PortaGiratoria if SWINGING_DOOR else Deadband
+        filtro = tipo(DEADBAND, HEARTBEAT)
+    amostras = gravadas = 0
 
-    try:
-        while True:
-            try:
-                drone_x = float(dX.get_value())
-                drone_y = float(dY.get_value())
-                drone_z = float(dZ.get_value())
-                target_x = float(tX.get_value())
-                target_y = float(tY.get_value())
-                target_z = float(tZ.get_value())
-            except Exception as e:
-                print(f"[MES] Erro ao ler do servidor: {e}")
-                time.sleep(1)
+    handler = subscription = None
+    if USE_SUBSCRIPTION:
+        handler = AmostraHandler(nodes)
+        subscription = client.create_subscription(PUBLISH_INTERVAL_MS, handler)
+        subscription.subscribe_data_change(list(nodes))
+        print(f"[MES] Amostrando por subscription ({PUBLISH_INTERVAL_MS} ms)")
+    else:
+        print(f"[MES] Amostrando a cada {PERIODO_AMOSTRAGEM} s")
+    print("[MES] Ctrl+C para sair")
+
+    # sem série, retoma da última linha do mes.txt; sem nenhum dos dois, um
+    # reinício regravaria as mesmas linhas, então o backfill é pulado
+    backfill = bool(BACKFILL_MAX_S)
+    ultimo = None
+    if backfill and serie is not None:
+        ultimo = serie.ultimo_t()
+    elif backfill:
+        ultimo = ultimo_t_arquivo(ARQUIVO_MES)
+        if ultimo is None:
+            print("[MES] Backfill pulado: sem série e sem linhas no mes.txt para retomar")
+            backfill = False
+
+    if backfill:
+        fim = datetime.now(timezone.utc)
+        inicio = fim - timedelta(seconds=BACKFILL_MAX_S)
+        if ultimo is not None:
+            inicio = max(inicio, datetime.fromtimestamp(ultimo, timezone.utc))
+        try:
+            linhas = ler_historico(nodes, inicio.replace(tzinfo=None), fim.replace(tzinfo=None))
+        except Exception as e:
+            print(f"[MES] Backfill indisponível: {e}")
+            linhas = []
+
+        n_backfill = 0
+        for t, valores in linhas:
+            if ultimo is not None and t <= ultimo:
                 continue
+            if kpi is not None:
+                kpi.atualizar(datetime.fromtimestamp(t), valores[:3], valores[3:])
+            gravar = [(t, valores)] if filtro is None else filtro.adicionar(t, valores)
+            for t_g, v in gravar:
+                gravar_amostra(historiador, serie, t_g, v)
+            n_backfill += 1
+        print(f"[MES] Backfill: {n_backfill} amostras do histórico do servidor")
 
-            timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S.%f")[:-3]
+    sched = FixedRateScheduler(PERIODO_AMOSTRAGEM)
+    sched.start()
 
-            linha = (
-                f"{timestamp}; "
-                f"DRONE_X={drone_x:.3f}; DRONE_Y={drone_y:.3f}; DRONE_Z={drone_z:.3f}; "
-                f"TARGET_X={target_x:.3f}; TARGET_Y={target_y:.3f}; TARGET_Z={target_z:.3f}\n"
-            )
+    try:
+        while True:
+            if handler is not None:
+                # o timeout garante o heartbeat mesmo sem notificações
+                valores = handler.esperar(PERIODO_AMOSTRAGEM)
+                if valores is None:
+                    continue
+            else:
+                sched.wait()
+                try:
+                    valores = tuple(float(v) for v in read_values(nodes))
+                except Exception as e:
+                    print(f"[MES] Erro ao ler do servidor: {e}")
+                    time.sleep(1)
+                    continue
 
-            try:
-                with open("mes.txt", "a", encoding="utf-8") as f:
-                    f.write(linha)
-            except Exception as e:
-                print(f"[MES] Erro ao escrever em mes.txt: {e}")
+            drone_x, drone_y, drone_z, target_x, target_y, target_z = valores
+            agora = datetime.now()
+            amostras += 1
 
-            print("[MES]", linha.strip())
-            time.sleep(1)
+            if kpi is not None:
+                kpi.atualizar(agora, (drone_x, drone_y, drone_z),
+                              (target_x, target_y, target_z))
+
+            if filtro is None:
+                gravar = [(agora.timestamp(), valores)]
+            else:
+                gravar = filtro.adicionar(agora.timestamp(), valores)
+            for t, v in gravar:
+                gravar_amostra(historiador, serie, t, v)
+                gravadas += 1
 
     except KeyboardInterrupt:
         print("\n[MES] Encerrando...")
+        if amostras:
+            print(f"[MES] {gravadas}/{amostras} amostras gravadas "
+                  f"({100.0 * gravadas / amostras:.1f}%)")
 
     finally:
+        if subscription is not None:
+            try:
+                subscription.delete()
+            except Exception:
+                pass
+        if filtro is not None:
+            for t, v in filtro.finalizar():
+                gravar_amostra(historiador, serie, t, v)
+        historiador.fechar()
+        if serie is not None:
+            serie.fechar()
+        if kpi is not None:
+            kpi.salvar_resumo()
         try:
             client.disconnect()
         except:
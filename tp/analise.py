@@ -0,0 +1,167 @@
+"""
+Análise de KPIs do drone a partir do mes.txt (ou das séries binárias).
+
+Uso:
+    python3 analise.py mes.txt
+    python3 analise.py mes.20261017-000000-000.txt.gz
+    python3 analise.py mes_serie
+
+Tudo é carregado de uma vez em arrays NumPy (np.fromregex para o texto,
+LeitorSerie para as séries) e os KPIs são calculados vetorizados, sem loop
+Python por amostra:
+- distância percorrida e perfis de velocidade/aceleração
+- tempo até o alvo depois de cada mudança de TargetX/Y/Z
+- percentis do erro de rastreamento (distância drone-alvo)
+"""
+
+import gzip
+import os
+import sys
+from collections import namedtuple
+
+import numpy as np
+
+from serie_temporal import LeitorSerie
+
+TOL_CHEGADA = 0.1      # m: drone "chegou" quando fica a essa distância do alvo
+PERCENTIS = (50, 90, 95, 99)
+
+# t em segundos (float64), drone e target com shape (n, 3)
+Trajetoria = namedtuple("Trajetoria", ["t", "drone", "target"])
+
+_REGEX_MES = (
+    r"(\d{4}-\d\d-\d\d \d\d:\d\d:\d\d\.\d{3}); "
+    r"DRONE_X=([-\d.]+); DRONE_Y=([-\d.]+); DRONE_Z=([-\d.]+); "
+    r"TARGET_X=([-\d.]+); TARGET_Y=([-\d.]+); TARGET_Z=([-\d.]+)"
+)
+_DTYPE_MES = np.dtype([("ts", "U23")] + [(c, "f8") for c in
+                       ("dx", "dy", "dz", "tx", "ty", "tz")])
+
+
+def carregar_mes(caminho):
+    """Lê mes.txt (ou um segmento .gz) em uma passada"""
+    abrir = gzip.open if caminho.endswith(".gz") else open
+    with abrir(caminho, "rt", encoding="utf-8") as f:
+        linhas = np.fromregex(f, _REGEX_MES, _DTYPE_MES)
+
+    t = linhas["ts"].astype("datetime64[ms]").astype("int64") / 1000.0
+    drone = np.column_stack([linhas["dx"], linhas["dy"], linhas["dz"]])
+    target = np.column_stack([linhas["tx"], linhas["ty"], linhas["tz"]])
+    return Trajetoria(t, drone, target)
+
+
+def carregar_serie(diretorio, t0=None, t1=None):
+    """Lê uma série binária (mes_serie ou historiador_serie)"""
+    dados = LeitorSerie(diretorio).ler_intervalo(t0, t1)
+    drone = np.column_stack([dados["DroneX"], dados["DroneY"], dados["DroneZ"]])
+    target = None
+    if "TargetX" in dados.dtype.names:
+        target = np.column_stack([dados["TargetX"], dados["TargetY"], dados["TargetZ"]])
+    return Trajetoria(np.asarray(dados["t"]), drone, target)
+
+
+def carregar(caminho):
+    if os.path.isdir(caminho):
+        return carregar_serie(caminho)
+    return carregar_mes(caminho)
+
+
+def distancia_percorrida(traj):
+    passos = np.linalg.norm(np.diff(traj.drone, axis=0), axis=1)
+    return float(passos.sum())
+
+
+def perfis_movimento(traj):
+    """
+    Velocidade escalar (m/s) entre amostras e aceleração (m/s²) entre
+    velocidades; amostras com dt <= 0 (timestamps repetidos) são descartadas.
+    """
+    dt = np.diff(traj.t)
+    validos = dt > 0
+    passos = np.linalg.norm(np.diff(traj.drone, axis=0), axis=1)
+
+    velocidade = passos[validos] / dt[validos]
+    t_meio = (traj.t[:-1][validos] + traj.t[1:][validos]) / 2
+
+    dt_v = np.diff(t_meio)
+    ok = dt_v > 0
+    aceleracao = np.diff(velocidade)[ok] / dt_v[ok]
+    return velocidade, aceleracao
+
+
+def erro_rastreamento(traj):
+    """Distância drone-alvo em cada amostra"""
+    return np.linalg.norm(traj.drone - traj.target, axis=1)
+
+
+def tempos_ate_alvo(traj, tol=TOL_CHEGADA):
+    """
+    Para cada mudança de alvo, segundos até o drone ficar a tol do novo alvo
+    (NaN se não chegou antes da próxima mudança ou do fim do log).
+    """
+    mudou = np.any(np.diff(traj.target, axis=0) != 0, axis=1)
+    inicios = np.flatnonzero(mudou) + 1
+    if inicios.size == 0:
+        return np.empty(0)
+
+    # segmento de cada amostra: 0 antes da 1a mudança, k depois da k-ésima
+    segmento = np.zeros(len(traj.t), dtype=np.int64)
+    segmento[inicios] = 1
+    segmento = np.cumsum(segmento)
+
+    dentro = np.flatnonzero(erro_rastreamento(traj) <= tol)
+    dentro = dentro[segmento[dentro] > 0]
+    segs, primeiro = np.unique(segmento[dentro], return_index=True)
+
+    tempos = np.full(inicios.size, np.nan)
+    chegada = dentro[primeiro]
+    tempos[segs - 1] = traj.t[chegada] - traj.t[inicios[segs - 1]]
+    return tempos
+
+
+def relatorio(traj, tol=TOL_CHEGADA):
+    """KPIs consolidados em um dicionário (base do relatório de turno)"""
+    velocidade, aceleracao = perfis_movimento(traj)
+    rel = {
+        "amostras": int(len(traj.t)),
+        "duracao_s": float(traj.t[-1] - traj.t[0]) if len(traj.t) else 0.0,
+        "distancia_m": distancia_percorrida(traj),
+        "vel_media_ms": float(velocidade.mean()) if velocidade.size else 0.0,
+        "vel_max_ms": float(velocidade.max()) if velocidade.size else 0.0,
+        "acel_max_ms2": float(np.abs(aceleracao).max()) if aceleracao.size else 0.0,
+    }
+
+    if traj.target is not None:
+        erro = erro_rastreamento(traj)
+        for p, v in zip(PERCENTIS, np.percentile(erro, PERCENTIS)):
+            rel[f"erro_p{p}_m"] = float(v)
+
+        tempos = tempos_ate_alvo(traj, tol)
+        chegou = tempos[~np.isnan(tempos)]
+        rel["mudancas_alvo"] = int(tempos.size)
+        rel["alvos_atingidos"] = int(chegou.size)
+        rel["tempo_ate_alvo_medio_s"] = float(chegou.mean()) if chegou.size else float("nan")
+        rel["tempo_ate_alvo_max_s"] = float(chegou.max()) if chegou.size else float("nan")
+
+    return rel
+
+
+def main():
+    if len(sys.argv) < 2:
+        print(__doc__)
+        sys.exit(1)
+
+    for caminho in sys.argv[1:]:
+        traj = carregar(caminho)
+        if len(traj.t) < 2:
+            print(f"[ANALISE] {caminho}: amostras insuficientes")
+            continue
+
+        print(f"[ANALISE] {caminho}")
+        for chave, valor in relatorio(traj).items():
+            print(f"  {chave:<24} {valor:.3f}" if isinstance(valor, float)
+                  else f"  {chave:<24} {valor}")
+
+
+if __name__ == "__main__":
+    main()
@@ -3,18 +3,33 @@ import math
 from opcua import Client
 from coppeliasim_zmqremoteapi_client import RemoteAPIClient
 
+from opc_helpers import WriteSuppressor, read_values, resolve_paths, write_values
+from scheduler import FixedRateScheduler
+
 ############################
 # CONFIG
 ############################
 OPCUA_URL   = "opc.tcp://localhost:53530/OPCUA/SimulationServer"
 DRONE_PATH  = "/Quadcopter/base"
 TARGET_PATH = "/target"
+VAR_NAMES   = ["TargetX", "TargetY", "TargetZ", "DroneX", "DroneY", "DroneZ"]
 
 # velocidade máx. do alvo (m/s) e passo de atualização
 TARGET_SPEED = 0.35
-DT           = 0.05         # 20 Hz
+DT           = 0.05         # 20 Hz (período alvo; 0.01–0.02 para 50–100 Hz)
+DT_MAX       = 0.25         # limita o dt medido após um travamento longo
 POS_TOL      = 1e-4         # tolerância para “parado”
 
+# modo síncrono: a simulação só avança um passo por tick do bridge
+STEPPING     = False
+# lê as duas poses e escreve o target numa única chamada de script
+BATCH_SCRIPT = True
+
+# DroneX/Y/Z só são escritos no Prosys quando o eixo anda mais que
+# WRITE_DEADBAND (m) ou depois de WRITE_HEARTBEAT s sem escrita
+WRITE_DEADBAND  = 1e-3
+WRITE_HEARTBEAT = 1.0
+
 ############################
 # OPC UA helpers
 ############################
@@ -23,50 +38,11 @@ def connect_opc(url=OPCUA_URL):
     client.connect()
     print("[OPC] Connected")
 
-    root = client.get_objects_node()
-
-    # Tente achar a pasta "Drone" no ns=3 (padrão do SimulationServer),
-    # e tenha fallback para procurar por nome entre os filhos.
-    drone_folder = None
-    try:
-        drone_folder = root.get_child(["3:Drone"])
-    except Exception:
-        # fallback: varrer filhos e procurar "Drone"
-        for n in root.get_children():
-            try:
-                name = n.get_browse_name().Name
-                if name.lower() == "drone":
-                    drone_folder = n
-                    break
-            except Exception:
-                pass
-    if drone_folder is None:
-        raise RuntimeError("Não encontrei a pasta 'Drone' no servidor OPC UA.")
-
-    # Mapeie variáveis por nome (case-insensitive)
-    name_to_node = {}
-    for v in drone_folder.get_children():
-        try:
-            nm = v.get_browse_name().Name
-            name_to_node[nm.lower()] = v
-        except Exception:
-            pass
-
-    # Esperadas (ajuste aqui se seus nomes diferirem)
-    tX = name_to_node.get("targetx")
-    tY = name_to_node.get("targety")
-    tZ = name_to_node.get("targetz")
-    dX = name_to_node.get("dronex")
-    dY = name_to_node.get("droney")
-    dZ = name_to_node.get("dronez")
-
-    if not all([tX, tY, tZ, dX, dY, dZ]):
-        found = ", ".join(sorted(name_to_node.keys()))
-        raise RuntimeError(
-            "Variáveis esperadas não encontradas. "
-            "Quero TargetX, TargetY, TargetZ, DroneX, DroneY, DroneZ. "
-            f"Encontradas: {found}"
-        )
+    # Drone/<variável> no ns=3 (padrão do SimulationServer); NodeIds ficam
+    # em cache, com fallback para browse por nome
+    tX, tY, tZ, dX, dY, dZ = resolve_paths(
+        client, url, [["Drone", nome] for nome in VAR_NAMES]
+    )
 
     print("[OPC] Vars bound:",
           "TargetX/TargetY/TargetZ & DroneX/DroneY/DroneZ")
@@ -75,7 +51,8 @@ def connect_opc(url=OPCUA_URL):
 ############################
 # Coppelia helpers
 ############################
-def connect_coppelia():
+def connect_coppelia(stepping=STEPPING):
+    """Conecta e (re)inicia a simulação; step é None fora do modo síncrono."""
     client = RemoteAPIClient()   # 127.0.0.1:23000
     sim = client.getObject('sim')
 
@@ -84,13 +61,54 @@ def connect_coppelia():
         sim.stopSimulation()
         while sim.getSimulationState() != sim.simulation_stopped:
             time.sleep(0.1)
+
+    step = enable_stepping(client, sim) if stepping else None
     sim.startSimulation()
     time.sleep(0.5)
 
     drone  = sim.getObject(DRONE_PATH)
     target = sim.getObject(TARGET_PATH)
     print("[SIM] Connected; handles ok")
-    return sim, drone, target
+    return sim, drone, target, step
+
+def enable_stepping(client, sim):
+    """Liga o modo síncrono (antes de startSimulation) e devolve a função de passo."""
+    try:
+        sim.setStepping(True)      # ZMQ remote API >= 4.6
+        step = sim.step
+    except Exception:
+        client.setStepping(True)   # API antiga
+        step = client.step
+    print("[SIM] Stepping mode on")
+    return step
+
+def make_batched_sync(sim, drone, target):
+    """
+    Devolve sync(p) que, numa única requisição ZMQ, escreve o target em p e
+    retorna (pos_target, pos_drone). Retorna None se o script não rodar.
+    """
+    try:
+        sandbox = sim.getScript(sim.scripttype_sandbox)
+    except Exception:
+        sandbox = sim.scripttype_sandboxscript   # API antiga
+
+    def sync(p):
+        code = (
+            "(function() "
+            f"sim.setObjectPosition({target}, -1, {{{p[0]!r}, {p[1]!r}, {p[2]!r}}}) "
+            f"return {{sim.getObjectPosition({target}, -1), sim.getObjectPosition({drone}, -1)}} "
+            "end)()@lua"
+        )
+        _, value = sim.executeScriptString(code, sandbox)
+        return list(value[0]), list(value[1])
+
+    try:
+        sync(get_pos(sim, target))
+    except Exception as e:
+        print("[SIM] batched script unavailable, using separate calls:", e)
+        return None
+    print("[SIM] Batched pose script ok")
+    return sync
 
 def get_pos(sim, handle):
     return sim.getObjectPosition(handle, -1)  # world
@@ -116,15 +134,16 @@ def step_towards(p_now, p_goal, vmax, dt):
 def main():
     # 1) Conectar
     opc_client, (tX, tY, tZ, dX, dY, dZ) = connect_opc()
-    sim, drone, target = connect_coppelia()
+    sim, drone, target, step = connect_coppelia()
+    sync = make_batched_sync(sim, drone, target) if BATCH_SCRIPT else None
 
     # senao o drone anda pro ultimo target salvo
     print("[INIT] Resetando targets para origem (0, 0, 1.5)...")
-    tX.set_value(0.0)
-    tY.set_value(0.0)
-    tZ.set_value(1.5)
+    write_values([tX, tY, tZ], [0.0, 0.0, 1.5])
     print("[INIT] Targets resetados!")
 
+    drone_writer = WriteSuppressor([dX, dY, dZ], WRITE_DEADBAND, WRITE_HEARTBEAT)
+    sched = None
     try:
         # 2) Inicial: mantenha alvo na altura mínima (decola suave)
         p_drone = get_pos(sim, drone)
@@ -133,35 +152,53 @@ def main():
         p_target = [p_target[0], p_target[1], alt]
         set_pos(sim, target, p_target)
 
+        # no modo síncrono o dt de integração é o passo da simulação, não o de parede
+        sim_dt = sim.getSimulationTimeStep() if step is not None else None
+
         # 3) loop
         print("[RUN] Control loop started. Press Ctrl+C to stop.")
+        sched = FixedRateScheduler(DT)
+        sched.start()
         while True:
+            # 3.0) esperar o próximo deadline e medir o dt real do tick
+            dt = min(sched.wait(), DT_MAX)
+            if sim_dt is not None:
+                dt = sim_dt
+
             # 3.1) ler comandos do Prosys
             try:
-                cmd = [float(tX.get_value()), float(tY.get_value()), float(tZ.get_value())]
+                cmd = [float(v) for v in read_values([tX, tY, tZ])]
             except Exception as e:
                 print("[OPC] read error:", e)
-                time.sleep(DT)
                 continue
 
             # 3.2) avançar o target suavemente até o comando
-            p_target = get_pos(sim, target)
-            p_next   = step_towards(p_target, cmd, TARGET_SPEED, DT)
-            set_pos(sim, target, p_next)
+            if sync is not None:
+                # uma requisição: escreve o target e lê as duas poses
+                p_next = step_towards(p_target, cmd, TARGET_SPEED, dt)
+                p_target, p_drone = sync(p_next)
+            else:
+                p_target = get_pos(sim, target)
+                p_next   = step_towards(p_target, cmd, TARGET_SPEED, dt)
+                set_pos(sim, target, p_next)
+                p_drone = get_pos(sim, drone)
 
             # 3.3) publicar pose do drone no Prosys
-            p_drone = get_pos(sim, drone)
             try:
-                dX.set_value(p_drone[0])
-                dY.set_value(p_drone[1])
-                dZ.set_value(p_drone[2])
+                drone_writer.write(p_drone)
             except Exception as e:
                 print("[OPC] write error:", e)
 
-            time.sleep(DT)
+            # 3.4) avançar a simulação um passo (modo síncrono)
+            if step is not None:
+                step()
 
     except KeyboardInterrupt:
         print("\n[RUN] Stopping...")
+        if sched is not None:
+            print(f"[RUN] {sched.ticks} ticks, {sched.overruns} overruns")
+        print(f"[RUN] drone writes: {drone_writer.written} channels written, "
+              f"{drone_writer.suppressed} suppressed")
     finally:
         try:
             sim.stopSimulation()
@@ -1,143 +1,326 @@
+import threading
 import time
-from opcua import Client, Server
+from collections import deque
+from datetime import datetime, timedelta
+from opcua import Client, Node, Server, ua
+from opcua.server.history import HistoryDict
+from opcua.server.history_sql import HistorySQLite
+
+from opc_helpers import read_data_values, resolve_paths
 
 UPSTREAM_URL = "opc.tcp://localhost:53530/OPCUA/SimulationServer"
 CHAINED_ENDPOINT = "opc.tcp://0.0.0.0:54000/OPCUA/ChainedServer"
 NAMESPACE_URI = "http://ufmg.br/drone/ChainedServer"
-DT = 0.2  # 5 Hz
+DT = 0.2  # 5 Hz (usado apenas no modo polling)
+
+# Com subscription o upstream empurra cada mudança; DT deixa de ser usado
+USE_SUBSCRIPTION = True
+PUBLISH_INTERVAL_MS = 50
+
+# Subárvores do upstream espelhadas aqui, como caminhos de browse a partir de
+# Objects (nomes no namespace NAMESPACE_UPSTREAM). Objetos e variáveis (com o
+# tipo do valor) são recriados no namespace local com os mesmos nomes, então
+# o MES continua achando Drone/DroneX... Para mais drones/dispositivos basta
+# acrescentar caminhos.
+RAIZES_UPSTREAM = [["Drone"]]
+NAMESPACE_UPSTREAM = 3
+PROFUNDIDADE_MAX = 8
+
+# Historical Access: o servidor guarda as mudanças das variáveis e os clientes
+# leem com read_raw_history(). Em memória fica um buffer circular de
+# HISTORICO_AMOSTRAS valores por variável; com HISTORICO_SQLITE o histórico
+# vai para esse arquivo e sobrevive a reinícios. HISTORICO_PERIODO limita a
+# idade nos dois casos. HISTORICO = False desliga.
+HISTORICO = True
+HISTORICO_AMOSTRAS = 100000
+HISTORICO_PERIODO = timedelta(days=1)
+HISTORICO_SQLITE = None   # ex.: "chained_history.sql"
 
+# Métricas do cache (objeto Diagnostico no próprio servidor + log)
+INTERVALO_METRICAS = 5.0
 
-def connect_upstream(url=UPSTREAM_URL):
+
+class HistoricoCircular(HistoryDict):
     """
-    Conecta ao servidor upstream e retorna client e nós das variáveis.
+    HistoryDict com deque de tamanho fixo por variável: o HistoryDict padrão
+    usa lista e list.pop(0), que fica O(n) com buffers grandes.
+    """
+    def new_historized_node(self, node_id, period, count=0):
+        super().new_historized_node(node_id, period, count)
+        self._datachanges[node_id] = deque(maxlen=count or None)
+
+    def save_node_value(self, node_id, datavalue):
+        data = self._datachanges[node_id]
+        period, _ = self._datachanges_period[node_id]
+        data.append(datavalue)
+        if period:
+            limite = datetime.utcnow() - period
+            while data and data[0].SourceTimestamp < limite:
+                data.popleft()
+
+
+class MetricasCache:
+    """
+    Métricas do servidor encadeado como cache: o upstream é lido uma vez
+    (subscription ou polling) e os clientes downstream leem das variáveis
+    locais. Conta as sessões downstream, os valores servidos por Read (o
+    AttributeService.read do servidor é embrulhado) e as atualizações vindas
+    do upstream, e publica as taxas nas variáveis do objeto Diagnostico.
+    """
+    def __init__(self, server, variaveis):
+        self.server = server
+        self.variaveis = variaveis
+        self.lock = threading.Lock()
+        self.leituras = 0
+        self.atualizacoes = 0
+        self.ultimo = time.monotonic()
+
+        servico = server.iserver.attribute_service
+        read_original = servico.read
+
+        def read(params):
+            with self.lock:
+                self.leituras += len(params.NodesToRead)
+            return read_original(params)
+
+        servico.read = read
+
+    def contar_atualizacao(self, n=1):
+        with self.lock:
+            self.atualizacoes += n
+
+    def sessoes(self):
+        bserver = getattr(self.server, "bserver", None)
+        return len(getattr(bserver, "clients", None) or ())
+
+    def publicar(self):
+        """A cada INTERVALO_METRICAS atualiza o Diagnostico e imprime as taxas"""
+        agora = time.monotonic()
+        dt = agora - self.ultimo
+        if dt < INTERVALO_METRICAS:
+            return
+
+        with self.lock:
+            leituras, self.leituras = self.leituras, 0
+            atualizacoes, self.atualizacoes = self.atualizacoes, 0
+        self.ultimo = agora
+
+        sessoes = self.sessoes()
+        leituras_s = leituras / dt
+        atualizacoes_s = atualizacoes / dt
+        try:
+            self.variaveis["Sessoes"].set_value(sessoes)
+            self.variaveis["LeiturasPorSegundo"].set_value(leituras_s)
+            self.variaveis["AtualizacoesUpstreamPorSegundo"].set_value(atualizacoes_s)
+        except Exception as e:
+            print(f"[CHAINED-SERVER] Erro ao publicar métricas: {e}")
+
+        print(f"[CHAINED-CACHE] sessões={sessoes} leituras/s={leituras_s:.1f} "
+              f"upstream/s={atualizacoes_s:.1f}")
+
+
+class MirrorHandler:
+    """
+    Handler da subscription: replica cada mudança do upstream na variável local.
+    """
+    def __init__(self, node_to_local, metricas=None):
+        self.node_to_local = node_to_local   # nodeid upstream -> (variável local, VariantType)
+        self.metricas = metricas
+
+    def datachange_notification(self, node, val, data):
+        espelho = self.node_to_local.get(node.nodeid)
+        if espelho is None:
+            return
+        if self.metricas is not None:
+            self.metricas.contar_atualizacao()
+        local, tipo = espelho
+        try:
+            local.set_value(ua.Variant(val, tipo))
+        except Exception as e:
+            print(f"[CHAINED-SERVER] Erro ao escrever nas variáveis locais: {e}")
+
+    def status_change_notification(self, status):
+        print(f"[CHAINED-CLIENT] Status da subscription alterado: {status}")
+
+
+def connect_upstream(url=UPSTREAM_URL, raizes=RAIZES_UPSTREAM):
+    """
+    Conecta ao servidor upstream e retorna o client e os nós raiz a espelhar.
     """
     print(f"[CHAINED-CLIENT] Conectando ao servidor upstream: {url}")
     client = Client(url)
     client.connect()
     print("[CHAINED-CLIENT] Conectado ao upstream")
 
-    root = client.get_objects_node()
-
-    drone_folder = None
     try:
-        drone_folder = root.get_child(["3:Drone"])
+        nos = resolve_paths(client, url, raizes, namespace=NAMESPACE_UPSTREAM)
     except Exception:
-        for node in root.get_children():
-            try:
-                if node.get_browse_name().Name.lower() == "drone":
-                    drone_folder = node
-                    break
-            except Exception:
-                pass
+        client.disconnect()
+        raise
+    return client, nos
 
-    if drone_folder is None:
-        raise RuntimeError("Pasta 'Drone' não encontrada no servidor upstream")
 
-    name_to_node = {}
-    for var in drone_folder.get_children():
-        try:
-            nm = var.get_browse_name().Name
-            name_to_node[nm.lower()] = var
-        except Exception:
-            pass
+def espelhar(up_node, local_pai, idx, espelhos, profundidade=0):
+    """
+    Recria sob local_pai os objetos e variáveis filhos de up_node: um Browse
+    por objeto e um Read em lote para os valores das variáveis do nível. Cada
+    variável espelhada entra em espelhos como (nó upstream, variável local,
+    VariantType).
+    """
+    filhos = up_node.get_children_descriptions(
+        nodeclassmask=ua.NodeClass.Object | ua.NodeClass.Variable
+    )
+
+    variaveis = [d for d in filhos if d.NodeClass == ua.NodeClass.Variable]
+    if variaveis:
+        nos = [Node(up_node.server, d.NodeId) for d in variaveis]
+        for d, node, dv in zip(variaveis, nos, read_data_values(nos)):
+            if not dv.StatusCode.is_good():
+                print(f"[CHAINED-CLIENT] {d.BrowseName.Name} ignorada: {dv.StatusCode}")
+                continue
+            tipo = dv.Value.VariantType
+            local = local_pai.add_variable(idx, d.BrowseName.Name, dv.Value.Value, tipo)
+            espelhos.append((node, local, tipo))
 
-    tX = name_to_node.get("targetx")
-    tY = name_to_node.get("targety")
-    tZ = name_to_node.get("targetz")
-    dX = name_to_node.get("dronex")
-    dY = name_to_node.get("droney")
-    dZ = name_to_node.get("dronez")
+    if profundidade >= PROFUNDIDADE_MAX:
+        return
+    for d in filhos:
+        if d.NodeClass == ua.NodeClass.Object:
+            local = local_pai.add_object(idx, d.BrowseName.Name)
+            espelhar(Node(up_node.server, d.NodeId), local, idx, espelhos, profundidade + 1)
+
+
+def espelhar_raizes(raizes, server, idx):
+    """Espelha cada raiz do upstream sob Objects do servidor local"""
+    objects = server.get_objects_node()
+    espelhos = []
+    for raiz in raizes:
+        local = objects.add_object(idx, raiz.get_browse_name().Name)
+        espelhar(raiz, local, idx, espelhos)
+    print(f"[CHAINED-SERVER] {len(espelhos)} variáveis espelhadas de {len(raizes)} raiz(es)")
+    return espelhos
 
-    if not all([tX, tY, tZ, dX, dY, dZ]):
-        found = ", ".join(sorted(name_to_node.keys()))
-        raise RuntimeError(
-            "Variáveis esperadas não encontradas no upstream. "
-            "Quero TargetX, TargetY, TargetZ, DroneX, DroneY, DroneZ. "
-            f"Encontradas: {found}"
-        )
 
-    print("[CHAINED-CLIENT] Variáveis mapeadas no upstream")
-    return client, (tX, tY, tZ, dX, dY, dZ)
+def assinar_upstream(client, espelhos, metricas=None):
+    """Subscription com um monitored item por variável espelhada"""
+    node_to_local = {up.nodeid: (local, tipo) for up, local, tipo in espelhos}
+    handler = MirrorHandler(node_to_local, metricas)
+    subscription = client.create_subscription(PUBLISH_INTERVAL_MS, handler)
+    subscription.subscribe_data_change([up for up, _, _ in espelhos])
+    print(f"[CHAINED-CLIENT] Subscription criada ({PUBLISH_INTERVAL_MS} ms)")
+    return subscription
 
 
 def start_chained_server():
     """
-    Inicia o servidor encadeado com objeto Drone e variáveis locais.
+    Inicia o servidor encadeado (ainda vazio) e retorna o server e o índice
+    do namespace local.
     """
     server = Server()
     server.set_endpoint(CHAINED_ENDPOINT)
     server.set_server_name("ChainedDroneServer")
+    if HISTORICO:
+        storage = HistorySQLite(HISTORICO_SQLITE) if HISTORICO_SQLITE else HistoricoCircular()
+        server.iserver.history_manager.set_storage(storage)
 
     idx = server.register_namespace(NAMESPACE_URI)
-    objects = server.get_objects_node()
-    drone_obj = objects.add_object(idx, "Drone")
-
-    var_drone_x = drone_obj.add_variable(idx, "DroneX", 0.0)
-    var_drone_y = drone_obj.add_variable(idx, "DroneY", 0.0)
-    var_drone_z = drone_obj.add_variable(idx, "DroneZ", 0.0)
-
-    var_target_x = drone_obj.add_variable(idx, "TargetX", 0.0)
-    var_target_y = drone_obj.add_variable(idx, "TargetY", 0.0)
-    var_target_z = drone_obj.add_variable(idx, "TargetZ", 1.5)
 
     server.start()
     print(f"[CHAINED-SERVER] Servidor OPC UA encadeado iniciado em {CHAINED_ENDPOINT}")
+    return server, idx
+
 
-    return server, {
-        "DroneX": var_drone_x,
-        "DroneY": var_drone_y,
-        "DroneZ": var_drone_z,
-        "TargetX": var_target_x,
-        "TargetY": var_target_y,
-        "TargetZ": var_target_z,
+def historizar(server, variaveis):
+    """Habilita o Historical Access nas variáveis (depois do start())"""
+    count = 0 if HISTORICO_SQLITE else HISTORICO_AMOSTRAS
+    for var in variaveis:
+        server.historize_node_data_change(var, period=HISTORICO_PERIODO, count=count)
+    destino = HISTORICO_SQLITE or f"memória ({HISTORICO_AMOSTRAS} amostras/variável)"
+    print(f"[CHAINED-SERVER] Histórico habilitado: {destino}")
+
+
+def criar_metricas(server):
+    """Cria o objeto Diagnostico com as variáveis de métricas do cache"""
+    idx = server.get_namespace_index(NAMESPACE_URI)
+    diag = server.get_objects_node().add_object(idx, "Diagnostico")
+    variaveis = {
+        "Sessoes": diag.add_variable(idx, "Sessoes", 0),
+        "LeiturasPorSegundo": diag.add_variable(idx, "LeiturasPorSegundo", 0.0),
+        "AtualizacoesUpstreamPorSegundo": diag.add_variable(
+            idx, "AtualizacoesUpstreamPorSegundo", 0.0),
     }
+    return MetricasCache(server, variaveis)
 
 
 def main():
     """
-    Espelha variáveis do upstream para o servidor encadeado em loop.
-    """
-    upstream_client, (tX, tY, tZ, dX, dY, dZ) = connect_upstream()
-    chained_server, local_vars = start_chained_server()
+    Espelha as subárvores do upstream para o servidor encadeado.
 
-    print("[CHAINED] Iniciando loop de espelhamento (Ctrl+C para sair)")
+    Com USE_SUBSCRIPTION as mudanças chegam pelo MirrorHandler e o loop só
+    publica as métricas; caso contrário faz polling a cada DT. Nos dois
+    casos a carga no upstream não depende de quantos clientes estão
+    conectados aqui.
+    """
+    # upstream primeiro: se ele estiver fora, o servidor local nem sobe
+    upstream_client, raizes = connect_upstream()
 
+    # a thread do servidor não é daemon: qualquer falha daqui em diante
+    # precisa passar pelo finally para o stop() liberar a porta
+    chained_server = None
+    subscription = None
     try:
+        chained_server, idx = start_chained_server()
+        metricas = criar_metricas(chained_server)
+        espelhos = espelhar_raizes(raizes, chained_server, idx)
+        if HISTORICO:
+            historizar(chained_server, [local for _, local, _ in espelhos])
+
+        if USE_SUBSCRIPTION:
+            subscription = assinar_upstream(upstream_client, espelhos, metricas)
+
+        if subscription is not None:
+            print("[CHAINED] Espelhando por subscription (Ctrl+C para sair)")
+            while True:
+                time.sleep(1)
+                metricas.publicar()
+
+        print("[CHAINED] Iniciando loop de espelhamento (Ctrl+C para sair)")
+        up_nodes = [up for up, _, _ in espelhos]
         while True:
             try:
-                drone_x = float(dX.get_value())
-                drone_y = float(dY.get_value())
-                drone_z = float(dZ.get_value())
-                target_x = float(tX.get_value())
-                target_y = float(tY.get_value())
-                target_z = float(tZ.get_value())
+                dvs = read_data_values(up_nodes)
             except Exception as e:
                 print(f"[CHAINED-CLIENT] Erro ao ler do upstream: {e}")
                 time.sleep(DT)
                 continue
+            metricas.contar_atualizacao(len(dvs))
 
             try:
-                local_vars["DroneX"].set_value(drone_x)
-                local_vars["DroneY"].set_value(drone_y)
-                local_vars["DroneZ"].set_value(drone_z)
-                local_vars["TargetX"].set_value(target_x)
-                local_vars["TargetY"].set_value(target_y)
-                local_vars["TargetZ"].set_value(target_z)
+                for (_, local, tipo), dv in zip(espelhos, dvs):
+                    if dv.StatusCode.is_good():
+                        local.set_value(ua.Variant(dv.Value.Value, tipo))
             except Exception as e:
                 print(f"[CHAINED-SERVER] Erro ao escrever nas variáveis locais: {e}")
 
+            metricas.publicar()
             time.sleep(DT)
 
     except KeyboardInterrupt:
         print("\n[CHAINED] Encerrando...")
 
     finally:
+        try:
+            if subscription is not None:
+                subscription.delete()
+        except Exception:
+            pass
         try:
             upstream_client.disconnect()
         except Exception:
             pass
         try:
-            chained_server.stop()
+            if chained_server is not None:
+                chained_server.stop()
         except Exception:
             pass
 
@@ -0,0 +1,150 @@
+"""
+Filtros que decidem quais amostras vale a pena gravar.
+
+Deadband: grava quando algum canal andou mais que o limiar desde a última
+amostra gravada, ou quando passou o heartbeat (para o log nunca ficar mudo
+e dar para distinguir "parado" de "processo caiu").
+
+PortaGiratoria (swinging door): guarda só os pontos necessários para que a
+interpolação linear entre pontos gravados fique a no máximo a tolerância de
+cada amostra original. Trechos retos (drone indo de uma bandeja a outra)
+viram dois pontos, qualquer que seja a taxa de amostragem.
+
+Os dois têm a mesma interface para quem grava linhas com vários canais:
+adicionar(t, valores) devolve a lista de amostras (t, valores) a gravar
+agora e finalizar() devolve o que ainda estiver pendente no fechamento.
+"""
+
+
+class Deadband:
+    def __init__(self, limiares, heartbeat=None):
+        """
+        limiares: um número (vale para todos os canais) ou um por canal.
+        heartbeat: segundos máximos sem gravar (None desliga).
+        """
+        self.limiares = limiares
+        self.heartbeat = heartbeat
+        self.ultimo_t = None
+        self.ultimos = None
+
+    def _limiar(self, i):
+        if isinstance(self.limiares, (int, float)):
+            return self.limiares
+        return self.limiares[i]
+
+    def deve_gravar(self, t, valores):
+        """True se a amostra (t em segundos, valores por canal) deve ser gravada"""
+        gravar = (
+            self.ultimos is None
+            or (self.heartbeat is not None and t - self.ultimo_t >= self.heartbeat)
+            or any(abs(v - u) > self._limiar(i)
+                   for i, (v, u) in enumerate(zip(valores, self.ultimos)))
+        )
+        if gravar:
+            self.ultimo_t = t
+            self.ultimos = tuple(valores)
+        return gravar
+
+    def adicionar(self, t, valores):
+        return [(t, tuple(valores))] if self.deve_gravar(t, valores) else []
+
+    def finalizar(self):
+        return []
+
+
+class _Porta:
+    """Porta giratória de um canal, a partir do último ponto gravado (ancora)"""
+    def __init__(self, tolerancia):
+        self.tolerancia = tolerancia
+        self.t0 = None
+        self.v0 = None
+        self.sup = float("inf")    # menor inclinação pelo lado de cima
+        self.inf = float("-inf")   # maior inclinação pelo lado de baixo
+
+    def ancorar(self, t, v):
+        self.t0, self.v0 = t, v
+        self.sup = float("inf")
+        self.inf = float("-inf")
+
+    def testar(self, t, v):
+        """Novas (sup, inf) se o ponto cabe no corredor, ou None se a porta fechou"""
+        dt = t - self.t0
+        if dt <= 0:
+            return self.sup, self.inf
+        sup = min(self.sup, (v + self.tolerancia - self.v0) / dt)
+        inf = max(self.inf, (v - self.tolerancia - self.v0) / dt)
+        return (sup, inf) if inf <= sup else None
+
+    def valor_no_corredor(self, t, v):
+        """
+        v trazido para dentro do corredor atual (muda no máximo a tolerância);
+        gravar esse valor em vez do medido garante o erro <= tolerância em
+        todo o trecho desde a âncora.
+        """
+        dt = t - self.t0
+        if dt <= 0:
+            return v
+        inclinacao = min(max((v - self.v0) / dt, self.inf), self.sup)
+        return self.v0 + inclinacao * dt
+
+
+class PortaGiratoria:
+    def __init__(self, tolerancias, max_intervalo=None):
+        """
+        tolerancias: um número (vale para todos os canais) ou um por canal.
+        max_intervalo: segundos máximos entre pontos gravados (None desliga).
+        """
+        self.tolerancias = tolerancias
+        self.max_intervalo = max_intervalo
+        self.portas = None
+        self.t_ancora = None
+        self.pendente = None   # última amostra vista e ainda não gravada
+
+    def _ancorar(self, t, valores):
+        for porta, v in zip(self.portas, valores):
+            porta.ancorar(t, v)
+        self.t_ancora = t
+
+    def adicionar(self, t, valores):
+        valores = tuple(valores)
+        if self.portas is None:
+            tol = self.tolerancias
+            if isinstance(tol, (int, float)):
+                tol = [tol] * len(valores)
+            self.portas = [_Porta(x) for x in tol]
+            self._ancorar(t, valores)
+            return [(t, valores)]
+
+        if self.max_intervalo is not None and t - self.t_ancora >= self.max_intervalo:
+            # antes de reancorar, a amostra pendente fecha o trecho atual;
+            # sem ela a interpolação até t ignoraria um degrau no meio
+            gravar = self.finalizar()
+            self._ancorar(t, valores)
+            return gravar + [(t, valores)]
+
+        novos = [porta.testar(t, v) for porta, v in zip(self.portas, valores)]
+        if None not in novos:
+            for porta, (sup, inf) in zip(self.portas, novos):
+                porta.sup, porta.inf = sup, inf
+            self.pendente = (t, valores)
+            return []
+
+        # a porta de algum canal fechou: grava a amostra anterior (todos os
+        # canais) e recomeça o corredor a partir dela
+        t_p, valores_p = self.pendente
+        gravar = (t_p, tuple(porta.valor_no_corredor(t_p, v)
+                             for porta, v in zip(self.portas, valores_p)))
+        self._ancorar(*gravar)
+        for porta, v in zip(self.portas, valores):
+            porta.sup, porta.inf = porta.testar(t, v)
+        self.pendente = (t, valores)
+        return [gravar]
+
+    def finalizar(self):
+        """Grava a última amostra para o trecho final não se perder"""
+        pendente, self.pendente = self.pendente, None
+        if pendente is None:
+            return []
+        t, valores = pendente
+        return [(t, tuple(porta.valor_no_corredor(t, v)
+                          for porta, v in zip(self.portas, valores)))]
@@ -0,0 +1,180 @@
+"""
+Consulta por intervalo de tempo em historiador.txt / mes.txt.
+
+Uso:
+    python3 consulta.py mes.txt "2026-10-18 14:00" "2026-10-18 14:05"
+    python3 consulta.py historiador.txt mes.20261017-000000-000.txt "2026-10-17 23:50" "2026-10-18 00:10"
+
+Ao lado de cada log fica um índice esparso (<log>.idx): a cada PASSO_INDICE
+bytes guarda o timestamp da primeira linha completa e o offset dela. A
+consulta abre o log com mmap, acha o offset de partida por busca binária no
+índice e lê só a região que interessa, em vez de varrer o arquivo inteiro.
+
+Montar o índice também não varre o arquivo: basta pular para cada múltiplo
+de PASSO_INDICE e ler a linha seguinte. Quando o log cresce, só a parte nova
+é indexada; se ele foi rotacionado (encolheu ou mudou a primeira linha), o
+índice é refeito.
+
+Os timestamps dos dois logs ("[2026-10-18 14:00:00.123] ..." e
+"2026-10-18 14:00:00.123; ...") têm largura fixa, então a ordem dos bytes é
+a ordem cronológica e a comparação é feita direto nos bytes, sem converter
+datas. Segmentos .gz não podem ser mapeados; descompacte antes de consultar.
+"""
+
+import bisect
+import mmap
+import os
+import struct
+import sys
+from datetime import datetime
+
+PASSO_INDICE = 64 * 1024
+TAM_TS = 23   # "AAAA-MM-DD HH:MM:SS.mmm"
+
+_MAGIC = b"SDAIDX01"
+_CABECALHO = struct.Struct("<8sIQ23s")   # magic, passo, bytes indexados, ts da 1a linha
+_ENTRADA = struct.Struct("<23sQ")        # timestamp, offset da linha
+
+
+def _timestamp(mm, pos):
+    """Timestamp (bytes) da linha que começa em pos, ou None se a linha não tiver"""
+    if mm[pos:pos + 1] == b"[":
+        pos += 1
+    ts = mm[pos:pos + TAM_TS]
+    if (len(ts) == TAM_TS and ts[4:5] == b"-" and ts[10:11] == b" "
+            and ts[19:20] == b"."):
+        return ts
+    return None
+
+
+def normalizar_ts(texto):
+    """'2026-10-18 14:00' -> b'2026-10-18 14:00:00.000' (mesmo formato dos logs)"""
+    dt = datetime.fromisoformat(texto)
+    return dt.strftime("%Y-%m-%d %H:%M:%S.%f")[:-3].encode()
+
+
+class IndiceEsparso:
+    def __init__(self, caminho_log, passo=PASSO_INDICE):
+        self.caminho = caminho_log + ".idx"
+        self.passo = passo
+        self.bytes_indexados = 0
+        self.primeira_ts = b""
+        self.timestamps = []
+        self.offsets = []
+
+    def _carregar(self):
+        try:
+            with open(self.caminho, "rb") as f:
+                dados = f.read()
+        except FileNotFoundError:
+            return False
+
+        if len(dados) < _CABECALHO.size:
+            return False
+        magic, passo, indexados, primeira = _CABECALHO.unpack_from(dados)
+        if magic != _MAGIC or passo != self.passo:
+            return False
+
+        self.bytes_indexados = indexados
+        self.primeira_ts = primeira
+        corpo = dados[_CABECALHO.size:]
+        corpo = corpo[:len(corpo) - len(corpo) % _ENTRADA.size]
+        for ts, offset in _ENTRADA.iter_unpack(corpo):
+            self.timestamps.append(ts)
+            self.offsets.append(offset)
+        return True
+
+    def _salvar(self):
+        temp = self.caminho + ".tmp"
+        with open(temp, "wb") as f:
+            f.write(_CABECALHO.pack(_MAGIC, self.passo, self.bytes_indexados,
+                                    self.primeira_ts))
+            for ts, offset in zip(self.timestamps, self.offsets):
+                f.write(_ENTRADA.pack(ts, offset))
+        os.replace(temp, self.caminho)
+
+    def atualizar(self, mm):
+        """Carrega o índice do disco e indexa o que o log ganhou desde então"""
+        primeira = _timestamp(mm, 0) or b""
+        if (not self._carregar() or self.bytes_indexados > len(mm)
+                or self.primeira_ts != primeira):
+            self.bytes_indexados = 0
+            self.primeira_ts = primeira
+            self.timestamps = []
+            self.offsets = []
+
+        mudou = False
+        if not self.timestamps and primeira:
+            self.timestamps.append(primeira)
+            self.offsets.append(0)
+            mudou = True
+
+        # próximo múltiplo do passo depois do que já foi indexado
+        limite = (self.bytes_indexados // self.passo + 1) * self.passo
+        while limite < len(mm):
+            quebra = mm.find(b"\n", limite)
+            if quebra == -1 or mm.find(b"\n", quebra + 1) == -1:
+                break   # a próxima linha ainda não está completa
+            inicio = quebra + 1
+            ts = _timestamp(mm, inicio)
+            if ts is not None:
+                self.timestamps.append(ts)
+                self.offsets.append(inicio)
+            self.bytes_indexados = limite
+            limite += self.passo
+            mudou = True
+
+        if mudou:
+            self._salvar()
+
+    def offset_inicial(self, ts):
+        """Offset de uma linha com timestamp < ts (ou 0); a busca começa ali"""
+        i = bisect.bisect_left(self.timestamps, ts)
+        return self.offsets[i - 1] if i > 0 else 0
+
+
+def consultar(caminho, inicio, fim, passo=PASSO_INDICE):
+    """
+    Gera as linhas de caminho com inicio <= timestamp <= fim (inicio e fim em
+    bytes no formato dos logs; use normalizar_ts).
+    """
+    with open(caminho, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            indice = IndiceEsparso(caminho, passo)
+            indice.atualizar(mm)
+
+            pos = indice.offset_inicial(inicio)
+            while pos < len(mm):
+                quebra = mm.find(b"\n", pos)
+                if quebra == -1:
+                    break
+                ts = _timestamp(mm, pos)
+                if ts is not None:
+                    if ts > fim:
+                        break
+                    if ts >= inicio:
+                        yield mm[pos:quebra].decode('utf-8', errors='replace').rstrip("\r")
+                pos = quebra + 1
+
+
+def main():
+    if len(sys.argv) < 4:
+        print(__doc__)
+        sys.exit(1)
+
+    *arquivos, inicio, fim = sys.argv[1:]
+    inicio = normalizar_ts(inicio)
+    fim = normalizar_ts(fim)
+
+    for caminho in arquivos:
+        if caminho.endswith(".gz"):
+            print(f"[CONSULTA] {caminho}: segmento comprimido, descompacte antes", file=sys.stderr)
+            continue
+        for linha in consultar(caminho, inicio, fim):
+            print(linha)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+"""
+Historiador - escrita de log em arquivo fora da thread de quem loga.
+
+Quem loga só coloca a linha numa fila. Uma thread dedicada mantém o arquivo
+aberto, junta as linhas em lotes e grava quando o lote enche (max_linhas)
+ou quando passa intervalo_flush segundos. Com fsync=True cada lote também é
+forçado para o disco (mais seguro em queda de energia, mais lento).
+
+Rotação opcional: por tamanho (max_bytes) e/ou na virada do dia
+(rotacao_diaria). O segmento fechado é renomeado para
+<nome>.<AAAAMMDD-HHMMSS>-<NNN><ext> (NNN desempata rotações no mesmo segundo e
+mantém a ordem alfabética igual à cronológica) e, com comprimir=True, vira
+.gz numa thread à parte para não atrasar a escrita. O .gz é gravado num
+temporário e renomeado no fim, e fechar() espera as compressões pendentes.
+"""
+
+import gzip
+import os
+import queue
+import shutil
+import threading
+import time
+from datetime import date, datetime
+
+_FIM = object()
+
+
+class Historiador:
+    def __init__(self, caminho, max_linhas=200, intervalo_flush=1.0, fsync=False,
+                 max_bytes=None, rotacao_diaria=False, comprimir=False):
+        self.caminho = caminho
+        self.max_linhas = max_linhas
+        self.intervalo_flush = intervalo_flush
+        self.fsync = fsync
+        self.max_bytes = max_bytes
+        self.rotacao_diaria = rotacao_diaria
+        self.comprimir = comprimir
+
+        self.f = None
+        self.dia_aberto = None
+        self.compressoes = []
+
+        self.fila = queue.Queue()
+        self.thread = threading.Thread(target=self._rodar, daemon=True)
+        self.thread.start()
+
+    def escrever(self, linha):
+        """Enfileira uma linha (sem \\n); nunca bloqueia quem chama"""
+        self.fila.put(linha)
+
+    def fechar(self, timeout=2.0):
+        """Grava o que falta na fila e encerra a thread"""
+        self.fila.put(_FIM)
+        self.thread.join(timeout)
+        for thread in self.compressoes:
+            thread.join()
+
+    def _rodar(self):
+        try:
+            self._abrir()
+        except Exception as e:
+            print(f"[HISTORIADOR] Erro ao abrir {self.caminho}: {e}")
+            return
+
+        lote = []
+        ultimo_flush = time.monotonic()
+        fim = False
+
+        while not fim:
+            espera = max(0.0, self.intervalo_flush - (time.monotonic() - ultimo_flush))
+            try:
+                item = self.fila.get(timeout=espera)
+                # aproveita o acordar para puxar o que já estiver na fila
+                while item is not _FIM:
+                    lote.append(item)
+                    if len(lote) >= self.max_linhas:
+                        break
+                    item = self.fila.get_nowait()
+                fim = item is _FIM
+            except queue.Empty:
+                pass
+
+            agora = time.monotonic()
+            if fim or len(lote) >= self.max_linhas or agora - ultimo_flush >= self.intervalo_flush:
+                if lote:
+                    self._gravar(lote)
+                    lote = []
+                ultimo_flush = agora
+
+        self.f.close()
+
+    def _abrir(self):
+        self.f = open(self.caminho, "a", encoding="utf-8")
+        self.dia_aberto = date.today()
+
+    def _gravar(self, lote):
+        try:
+            if self.rotacao_diaria and date.today() != self.dia_aberto:
+                self._rotacionar()
+
+            self.f.write("".join(linha + "\n" for linha in lote))
+            self.f.flush()
+            if self.fsync:
+                os.fsync(self.f.fileno())
+
+            if self.max_bytes is not None and self.f.tell() >= self.max_bytes:
+                self._rotacionar()
+        except Exception as e:
+            print(f"[HISTORIADOR] Erro ao escrever em {self.caminho}: {e}")
+
+    def _rotacionar(self):
+        """Fecha o arquivo atual, renomeia como segmento e abre um novo"""
+        self.f.close()
+
+        base, ext = os.path.splitext(self.caminho)
+        carimbo = datetime.now().strftime("%Y%m%d-%H%M%S")
+        n = 0
+        segmento = f"{base}.{carimbo}-{n:03d}{ext}"
+        while os.path.exists(segmento) or os.path.exists(segmento + ".gz"):
+            n += 1
+            segmento = f"{base}.{carimbo}-{n:03d}{ext}"
+
+        try:
+            os.replace(self.caminho, segmento)
+        finally:
+            self._abrir()
+        print(f"[HISTORIADOR] Segmento fechado: {segmento}")
+
+        if self.comprimir:
+            self.compressoes = [t for t in self.compressoes if t.is_alive()]
+            thread = threading.Thread(target=_comprimir, args=(segmento,), daemon=True)
+            thread.start()
+            self.compressoes.append(thread)
+
+
+def _comprimir(caminho):
+    """Gera caminho.gz e remove o original; um .gz truncado nunca fica com o nome final"""
+    temp = caminho + ".gz.tmp"
+    try:
+        with open(caminho, "rb") as entrada, gzip.open(temp, "wb") as saida:
+            shutil.copyfileobj(entrada, saida)
+        os.replace(temp, caminho + ".gz")
+        os.remove(caminho)
+    except Exception as e:
+        print(f"[HISTORIADOR] Erro ao comprimir {caminho}: {e}")
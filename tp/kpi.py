@@ -0,0 +1,115 @@
+"""
+KPIs incrementais do MES: atualizados a cada amostra, sem reler o log.
+
+Duas janelas correm em paralelo: minuto e turno. Cada uma guarda só somas,
+máximos e contadores, então cada amostra custa O(1). Quando uma janela
+fecha, o resumo dela vai para o arquivo JSON (mes_kpi.json), que sempre
+contém a janela atual e a última fechada de cada tipo.
+"""
+
+import json
+import math
+import os
+from datetime import timedelta
+
+
+class JanelaKPI:
+    def __init__(self, inicio):
+        self.inicio = inicio
+        self.fim = inicio
+        self.n = 0
+        self.soma_erro = 0.0
+        self.max_erro = 0.0
+        self.distancia = 0.0
+        self.mudancas_alvo = 0
+
+    def adicionar(self, agora, erro, passo, mudou_alvo):
+        self.fim = agora
+        self.n += 1
+        self.soma_erro += erro
+        self.max_erro = max(self.max_erro, erro)
+        self.distancia += passo
+        if mudou_alvo:
+            self.mudancas_alvo += 1
+
+    def resumo(self):
+        return {
+            "inicio": self.inicio.isoformat(sep=" ", timespec="seconds"),
+            "fim": self.fim.isoformat(sep=" ", timespec="seconds"),
+            "amostras": self.n,
+            "erro_medio_m": self.soma_erro / self.n if self.n else 0.0,
+            "erro_max_m": self.max_erro,
+            "distancia_m": self.distancia,
+            "mudancas_alvo": self.mudancas_alvo,
+        }
+
+
+class AgregadorKPI:
+    def __init__(self, arquivo_resumo="mes_kpi.json", turno_horas=8, turno_inicio_h=6):
+        self.arquivo_resumo = arquivo_resumo
+        self.turno = timedelta(hours=turno_horas)
+        self.turno_inicio = timedelta(hours=turno_inicio_h)
+
+        self.ultimo_drone = None
+        self.ultimo_target = None
+
+        self.minuto = None
+        self.minuto_anterior = None
+        self.turno_atual = None
+        self.turno_anterior = None
+
+    def _inicio_turno(self, agora):
+        base = agora.replace(hour=0, minute=0, second=0, microsecond=0) + self.turno_inicio
+        if agora < base:
+            base -= timedelta(days=1)
+        return base + self.turno * int((agora - base) / self.turno)
+
+    def atualizar(self, agora, drone, target):
+        """Incorpora uma amostra (agora: datetime; drone/target: (x, y, z))"""
+        erro = math.dist(drone, target)
+        passo = math.dist(drone, self.ultimo_drone) if self.ultimo_drone else 0.0
+        mudou_alvo = self.ultimo_target is not None and tuple(target) != self.ultimo_target
+        self.ultimo_drone = tuple(drone)
+        self.ultimo_target = tuple(target)
+
+        fechou = False
+
+        inicio_minuto = agora.replace(second=0, microsecond=0)
+        if self.minuto is None or inicio_minuto != self.minuto.inicio:
+            if self.minuto is not None:
+                self.minuto_anterior = self.minuto
+                fechou = True
+            self.minuto = JanelaKPI(inicio_minuto)
+
+        inicio_turno = self._inicio_turno(agora)
+        if self.turno_atual is None or inicio_turno != self.turno_atual.inicio:
+            if self.turno_atual is not None:
+                self.turno_anterior = self.turno_atual
+                fechou = True
+            self.turno_atual = JanelaKPI(inicio_turno)
+
+        self.minuto.adicionar(agora, erro, passo, mudou_alvo)
+        self.turno_atual.adicionar(agora, erro, passo, mudou_alvo)
+
+        if fechou:
+            self.salvar_resumo()
+
+    def resumo(self):
+        def r(janela):
+            return janela.resumo() if janela is not None else None
+
+        return {
+            "minuto_atual": r(self.minuto),
+            "ultimo_minuto": r(self.minuto_anterior),
+            "turno_atual": r(self.turno_atual),
+            "ultimo_turno": r(self.turno_anterior),
+        }
+
+    def salvar_resumo(self):
+        temp = self.arquivo_resumo + ".tmp"
+        try:
+            with open(temp, "w", encoding="utf-8") as f:
+                json.dump(self.resumo(), f, indent=2)
+            os.replace(temp, self.arquivo_resumo)
+        except Exception as e:
+            print(f"[MES-KPI] Erro ao salvar {self.arquivo_resumo}: {e}")
@@ -0,0 +1,209 @@
+"""
+Helpers OPC UA compartilhados por CLP, bridge, MES e chained_server.
+
+Leitura e escrita em lote: um único serviço Read (ou Write) para um vetor de
+nós, em vez de um get_value()/set_value() por variável.
+
+Supressão de escrita: WriteSuppressor só escreve os canais que mudaram mais
+que o deadband desde o último valor escrito (ou que passaram max_silence sem
+escrita), também num único Write.
+
+Resolução de nós: resolve_paths() troca o browse nó a nó por um único
+TranslateBrowsePathsToNodeIds e guarda os NodeIds em disco. No próximo
+início basta um Read dos BrowseNames para validar o cache.
+"""
+
+import json
+import os
+import time
+
+from opcua import Node, ua
+
+NODE_CACHE = "opc_nodes_cache.json"
+
+
+def read_data_values(nodes):
+    """Lê o Value de todos os nós em um único Read; retorna os DataValues sem checar status."""
+    params = ua.ReadParameters()
+    for node in nodes:
+        rv = ua.ReadValueId()
+        rv.NodeId = node.nodeid
+        rv.AttributeId = ua.AttributeIds.Value
+        params.NodesToRead.append(rv)
+
+    return nodes[0].server.read(params)
+
+
+def read_values(nodes):
+    """Lê o Value de todos os nós em um único Read; retorna lista de valores."""
+    values = []
+    for dv in read_data_values(nodes):
+        dv.StatusCode.check()
+        values.append(dv.Value.Value)
+    return values
+
+
+def write_values(nodes, values):
+    """Escreve values (como Double) nos nós correspondentes em um único Write."""
+    params = ua.WriteParameters()
+    for node, value in zip(nodes, values):
+        wv = ua.WriteValue()
+        wv.NodeId = node.nodeid
+        wv.AttributeId = ua.AttributeIds.Value
+        wv.Value = ua.DataValue(ua.Variant(float(value), ua.VariantType.Double))
+        params.NodesToWrite.append(wv)
+
+    results = nodes[0].server.write(params)
+
+    for status in results:
+        status.check()
+
+
+class WriteSuppressor:
+    def __init__(self, nodes, deadband=0.0, max_silence=None):
+        """
+        deadband: um número (vale para todos os canais) ou um por canal.
+        max_silence: segundos máximos sem escrever um canal (None desliga).
+        """
+        self.nodes = list(nodes)
+        if isinstance(deadband, (int, float)):
+            deadband = [deadband] * len(self.nodes)
+        self.deadband = list(deadband)
+        self.max_silence = max_silence
+        self.last = [None] * len(self.nodes)
+        self.last_time = [0.0] * len(self.nodes)
+        self.written = 0
+        self.suppressed = 0
+
+    def write(self, values, force=False):
+        """Escreve só os canais necessários; o primeiro write é sempre completo."""
+        now = time.monotonic()
+        changed = [
+            i for i, value in enumerate(values)
+            if force or self.last[i] is None
+            or abs(value - self.last[i]) > self.deadband[i]
+            or (self.max_silence is not None and now - self.last_time[i] >= self.max_silence)
+        ]
+        self.suppressed += len(self.nodes) - len(changed)
+        if not changed:
+            return 0
+
+        write_values([self.nodes[i] for i in changed], [values[i] for i in changed])
+        for i in changed:
+            self.last[i] = values[i]
+            self.last_time[i] = now
+        self.written += len(changed)
+        return len(changed)
+
+
+def _read_attribute(client, nodeids, attribute):
+    params = ua.ReadParameters()
+    for nodeid in nodeids:
+        rv = ua.ReadValueId()
+        rv.NodeId = nodeid
+        rv.AttributeId = attribute
+        params.NodesToRead.append(rv)
+    return client.uaclient.read(params)
+
+
+def _browse_path(ns, path):
+    bp = ua.BrowsePath()
+    bp.StartingNode = ua.NodeId(ua.ObjectIds.ObjectsFolder)
+    for name in path:
+        el = ua.RelativePathElement()
+        el.ReferenceTypeId = ua.NodeId(ua.ObjectIds.HierarchicalReferences)
+        el.IsInverse = False
+        el.IncludeSubtypes = True
+        el.TargetName = ua.QualifiedName(name, ns)
+        bp.RelativePath.Elements.append(el)
+    return bp
+
+
+def _translate(client, ns, paths):
+    """Um único TranslateBrowsePathsToNodeIds; None para caminho não resolvido"""
+    results = client.uaclient.translate_browsepaths_to_nodeids(
+        [_browse_path(ns, path) for path in paths]
+    )
+    nodeids = []
+    for result in results:
+        if result.StatusCode.is_good() and result.Targets:
+            nodeids.append(result.Targets[0].TargetId)
+        else:
+            nodeids.append(None)
+    return nodeids
+
+
+def _browse_by_name(client, path):
+    """Fallback: desce o caminho comparando nomes sem diferenciar maiúsculas"""
+    node = client.get_objects_node()
+    for name in path:
+        for child in node.get_children_descriptions():
+            if child.BrowseName.Name.lower() == name.lower():
+                node = Node(client.uaclient, child.NodeId)
+                break
+        else:
+            return None
+    return node.nodeid
+
+
+def _load_cache(cache_path):
+    try:
+        with open(cache_path, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _save_cache(cache_path, key, nodeids):
+    cache = _load_cache(cache_path)
+    cache[key] = [nodeid.to_string() for nodeid in nodeids]
+    temp = f"{cache_path}.{os.getpid()}.tmp"
+    try:
+        with open(temp, "w", encoding="utf-8") as f:
+            json.dump(cache, f, indent=2)
+        os.replace(temp, cache_path)
+    except OSError as e:
+        print(f"[OPC] Não foi possível salvar {cache_path}: {e}")
+
+
+def resolve_paths(client, url, paths, namespace=3, cache_path=NODE_CACHE):
+    """
+    Resolve caminhos de browse a partir de Objects (ex.: ["Drone", "DroneX"])
+    e retorna os Nodes na mesma ordem.
+
+    namespace é o índice (3 no SimulationServer) ou a URI do namespace dos
+    nomes. O cache é indexado pela URL do servidor e pela URI do namespace,
+    então um servidor que reordenou os namespaces não reaproveita NodeIds
+    errados. Ordem: cache validado por um Read dos BrowseNames, depois
+    TranslateBrowsePathsToNodeIds em lote e, para o que faltar, browse por
+    nome.
+    """
+    ns_array = client.get_namespace_array()
+    if isinstance(namespace, str):
+        ns_uri = namespace
+        ns = ns_array.index(namespace)
+    else:
+        ns = namespace
+        ns_uri = ns_array[ns] if ns < len(ns_array) else str(ns)
+    key = f"{url}|{ns_uri}|" + ";".join("/".join(path) for path in paths)
+
+    cached = _load_cache(cache_path).get(key)
+    if cached is not None and len(cached) == len(paths):
+        nodeids = [ua.NodeId.from_string(s) for s in cached]
+        names = _read_attribute(client, nodeids, ua.AttributeIds.BrowseName)
+        if all(dv.StatusCode.is_good()
+               and dv.Value.Value.Name.lower() == path[-1].lower()
+               for dv, path in zip(names, paths)):
+            return [client.get_node(nodeid) for nodeid in nodeids]
+
+    nodeids = _translate(client, ns, paths)
+    for i, path in enumerate(paths):
+        if nodeids[i] is None:
+            nodeids[i] = _browse_by_name(client, path)
+
+    missing = ["/".join(path) for path, nodeid in zip(paths, nodeids) if nodeid is None]
+    if missing:
+        raise RuntimeError(f"Nós não encontrados no servidor {url}: {', '.join(missing)}")
+
+    _save_cache(cache_path, key, nodeids)
+    return [client.get_node(nodeid) for nodeid in nodeids]
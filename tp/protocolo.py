@@ -0,0 +1,111 @@
+"""
+Protocolo texto CLP <-> Supervisório: um comando/resposta por linha (terminada em \\n).
+
+TCP é um fluxo de bytes: um recv() pode trazer meia linha ou várias linhas
+juntas. LeitorLinhas acumula o que chega e entrega exatamente uma linha por
+chamada, na ordem em que foram enviadas.
+"""
+
+import struct
+
+
+class LeitorLinhas:
+    def __init__(self, sock, tamanho_recv=4096):
+        self.sock = sock
+        self.tamanho_recv = tamanho_recv
+        self.buffer = b""
+
+    def ler_linha(self):
+        """
+        Retorna a próxima linha (sem o \\n), ou None se a conexão fechou.
+        socket.timeout é propagado sem perder o que já estava no buffer.
+        """
+        while b"\n" not in self.buffer:
+            data = self.sock.recv(self.tamanho_recv)
+            if not data:
+                return None
+            self.buffer += data
+
+        linha, self.buffer = self.buffer.split(b"\n", 1)
+        return linha.decode('utf-8').strip()
+
+
+def enviar_linha(sock, texto):
+    """Envia texto como uma linha do protocolo"""
+    sock.sendall(f"{texto}\n".encode('utf-8'))
+
+
+# ---------------------------------------------------------------------------
+# Modo binário, negociado com "FORMATO BIN" logo após o "CLP PRONTO".
+# Os comandos do cliente continuam em texto; o que vem do CLP passa a ser
+# frames [comprimento <H][tipo <B][corpo], com o comprimento contando só o corpo.
+#   FRAME_TELEMETRIA: 7 doubles little-endian (drone xyz, target xyz, tempo epoch)
+#   FRAME_TEXTO:      resposta a comando em UTF-8, sem o \n
+#   FRAME_MISSAO:     id, concluídos, total (<3I) e a fase em UTF-8; vai logo
+#                     depois da telemetria quando existe progresso de missão
+# ---------------------------------------------------------------------------
+FRAME_TELEMETRIA = 1
+FRAME_TEXTO = 2
+FRAME_MISSAO = 3
+
+_CABECALHO = struct.Struct("<HB")
+_TELEMETRIA = struct.Struct("<7d")
+_MISSAO = struct.Struct("<3I")
+
+
+def empacotar_telemetria(drone_pos, target_pos, timestamp):
+    corpo = _TELEMETRIA.pack(*drone_pos, *target_pos, timestamp)
+    return _CABECALHO.pack(len(corpo), FRAME_TELEMETRIA) + corpo
+
+
+def empacotar_missao(progresso):
+    id_missao, concluidos, total, fase = progresso
+    corpo = _MISSAO.pack(id_missao, concluidos, total) + fase.encode('utf-8')
+    return _CABECALHO.pack(len(corpo), FRAME_MISSAO) + corpo
+
+
+def empacotar_texto(texto):
+    corpo = texto.encode('utf-8')
+    return _CABECALHO.pack(len(corpo), FRAME_TEXTO) + corpo
+
+
+class LeitorFrames:
+    """
+    Equivalente binário do LeitorLinhas. Recebe o buffer que sobrou do
+    LeitorLinhas na troca de formato, para não perder bytes já lidos.
+    """
+    def __init__(self, sock, buffer=b"", tamanho_recv=4096):
+        self.sock = sock
+        self.tamanho_recv = tamanho_recv
+        self.buffer = buffer
+
+    def _garantir(self, n):
+        while len(self.buffer) < n:
+            data = self.sock.recv(self.tamanho_recv)
+            if not data:
+                return False
+            self.buffer += data
+        return True
+
+    def ler_frame(self):
+        """
+        Retorna (FRAME_TELEMETRIA, (drone, target, timestamp)),
+        (FRAME_MISSAO, (id, concluídos, total, fase)) ou (FRAME_TEXTO, texto);
+        None se a conexão fechou.
+        """
+        if not self._garantir(_CABECALHO.size):
+            return None
+        comprimento, tipo = _CABECALHO.unpack_from(self.buffer)
+        if not self._garantir(_CABECALHO.size + comprimento):
+            return None
+
+        corpo = self.buffer[_CABECALHO.size:_CABECALHO.size + comprimento]
+        self.buffer = self.buffer[_CABECALHO.size + comprimento:]
+
+        if tipo == FRAME_TELEMETRIA:
+            v = _TELEMETRIA.unpack(corpo)
+            return tipo, (v[0:3], v[3:6], v[6])
+        if tipo == FRAME_MISSAO:
+            v = _MISSAO.unpack_from(corpo)
+            return tipo, (*v, corpo[_MISSAO.size:].decode('utf-8'))
+        return tipo, corpo.decode('utf-8')
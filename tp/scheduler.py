@@ -0,0 +1,88 @@
+"""
+Agendador de taxa fixa baseado em deadlines absolutos.
+
+Em vez de "trabalha e depois dorme DT" (período real = DT + latência), cada
+tick tem um deadline absoluto k * period a partir do início. O dt medido entre
+ticks é devolvido para quem integra no tempo, e deadlines perdidos contam como
+overrun.
+
+ScanStats acumula o tempo de execução de cada ciclo (min/avg/max desde o
+início e p99 sobre uma janela das últimas execuções).
+"""
+
+import threading
+import time
+from collections import deque
+
+
+class FixedRateScheduler:
+    def __init__(self, period):
+        self.period = period
+        self.next_deadline = None
+        self.last_tick = None
+        self.ticks = 0
+        self.overruns = 0
+
+    def start(self):
+        """Marca o instante zero; o primeiro deadline é start + period."""
+        now = time.monotonic()
+        self.last_tick = now
+        self.next_deadline = now + self.period
+
+    def wait(self, event=None):
+        """
+        Dorme até o próximo deadline e devolve o dt real desde o tick anterior.
+
+        Com event (threading.Event), acorda antes se ele for setado: limpa o
+        evento e devolve None sem consumir o deadline; quem chamou trata o
+        evento e chama wait() de novo.
+        """
+        if self.next_deadline is None:
+            self.start()
+
+        delay = self.next_deadline - time.monotonic()
+        if delay > 0:
+            if event is None:
+                time.sleep(delay)
+            elif event.wait(delay):
+                event.clear()
+                return None
+            self.next_deadline += self.period
+        else:
+            # Tick atrasado: pula os deadlines perdidos em vez de rodar em rajada
+            self.overruns += 1
+            missed = int(-delay // self.period) + 1
+            self.next_deadline += missed * self.period
+
+        now = time.monotonic()
+        dt = now - self.last_tick
+        self.last_tick = now
+        self.ticks += 1
+        return dt
+
+
+class ScanStats:
+    def __init__(self, window=1000):
+        self.lock = threading.Lock()
+        self.recent = deque(maxlen=window)
+        self.count = 0
+        self.total = 0.0
+        self.min = float("inf")
+        self.max = 0.0
+
+    def record(self, duration):
+        with self.lock:
+            self.recent.append(duration)
+            self.count += 1
+            self.total += duration
+            self.min = min(self.min, duration)
+            self.max = max(self.max, duration)
+
+    def snapshot(self):
+        """(count, min, avg, max, p99) em segundos; p99 sobre a janela recente."""
+        with self.lock:
+            if not self.count:
+                return 0, 0.0, 0.0, 0.0, 0.0
+            recent = sorted(self.recent)
+            p99 = recent[min(len(recent) - 1, int(0.99 * len(recent)))]
+            return self.count, self.min, self.total / self.count, self.max, p99
@@ -0,0 +1,312 @@
+"""
+Série temporal binária para o historiador (supervisorio.py) e o MES.
+
+Em vez de linhas de texto que precisam de regex, cada amostra é um registro
+de largura fixa: timestamp (epoch, float64) seguido de um float64 por canal,
+little-endian. Os registros ficam em chunks dentro de um diretório:
+
+    <dir>/chunk_000000.bin   cabeçalho + registros
+    <dir>/chunk_000001.bin
+    <dir>/indice.json        por chunk: n, t_min, t_max e min/max de cada canal
+
+Cabeçalho do chunk: magic b"SDASERIE", versão <H, n_canais <H, tamanho do
+cabeçalho <I, nomes dos canais em UTF-8 separados por \\0, completado com
+zeros até múltiplo de 8.
+
+A leitura (LeitorSerie) usa NumPy: cada chunk é aberto com np.memmap e o
+intervalo de tempo é achado por busca binária, então ler alguns minutos de um
+dia inteiro de dados toca só os bytes do intervalo. O escritor não depende de
+NumPy.
+"""
+
+import json
+import os
+import queue
+import struct
+import threading
+import time
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+MAGIC = b"SDASERIE"
+VERSAO = 1
+_CABECALHO_FIXO = struct.Struct("<8sHHI")
+ARQUIVO_INDICE = "indice.json"
+_FIM = object()
+
+
+def _nome_chunk(numero):
+    return f"chunk_{numero:06d}.bin"
+
+
+def _montar_cabecalho(canais):
+    nomes = "\0".join(canais).encode('utf-8')
+    tamanho = _CABECALHO_FIXO.size + len(nomes)
+    tamanho += (-tamanho) % 8
+    fixo = _CABECALHO_FIXO.pack(MAGIC, VERSAO, len(canais), tamanho)
+    return (fixo + nomes).ljust(tamanho, b"\0")
+
+
+def _ler_cabecalho(caminho):
+    """Retorna (canais, tamanho_cabecalho) de um chunk"""
+    with open(caminho, "rb") as f:
+        fixo = f.read(_CABECALHO_FIXO.size)
+        magic, versao, n_canais, tamanho = _CABECALHO_FIXO.unpack(fixo)
+        if magic != MAGIC or versao != VERSAO:
+            raise ValueError(f"{caminho}: não é um chunk de série temporal v{VERSAO}")
+        nomes = f.read(tamanho - _CABECALHO_FIXO.size).rstrip(b"\0")
+    canais = nomes.decode('utf-8').split("\0")
+    if len(canais) != n_canais:
+        raise ValueError(f"{caminho}: cabeçalho inconsistente")
+    return canais, tamanho
+
+
+class EscritorSerie:
+    """
+    Append-only. Um chunk novo é aberto a cada registros_por_chunk amostras,
+    a cada reinício do processo e quando o relógio volta para trás (cada
+    chunk fica ordenado no tempo).
+    """
+    def __init__(self, diretorio, canais, registros_por_chunk=65536, intervalo_flush=5.0):
+        self.diretorio = diretorio
+        self.canais = list(canais)
+        self.registros_por_chunk = registros_por_chunk
+        self.intervalo_flush = intervalo_flush
+
+        self.registro = struct.Struct("<" + "d" * (1 + len(self.canais)))
+        self.cabecalho = _montar_cabecalho(self.canais)
+        self.lock = threading.Lock()
+
+        os.makedirs(diretorio, exist_ok=True)
+        self.indice = self._carregar_indice()
+        self._reparar_ultimo_chunk()
+
+        self.f = None
+        self.atual = None
+        self.ultimo_flush = time.monotonic()
+        self._novo_chunk()
+
+    def _carregar_indice(self):
+        caminho = os.path.join(self.diretorio, ARQUIVO_INDICE)
+        if not os.path.exists(caminho):
+            return {"canais": self.canais, "chunks": []}
+
+        with open(caminho, encoding="utf-8") as f:
+            indice = json.load(f)
+        if indice["canais"] != self.canais:
+            raise ValueError(
+                f"{self.diretorio} já tem canais {indice['canais']}, não {self.canais}"
+            )
+        return indice
+
+    def _reparar_ultimo_chunk(self):
+        """
+        O último chunk de uma execução anterior pode ter mais registros do que
+        o índice salvo (queda entre flushes); recalcula a entrada dele.
+        """
+        if not self.indice["chunks"]:
+            return
+        chunk = self.indice["chunks"][-1]
+        caminho = os.path.join(self.diretorio, chunk["arquivo"])
+        if not os.path.exists(caminho):
+            return
+
+        _, tamanho_cabecalho = _ler_cabecalho(caminho)
+        with open(caminho, "rb") as f:
+            f.seek(tamanho_cabecalho)
+            dados = f.read()
+        dados = dados[:len(dados) - len(dados) % self.registro.size]
+
+        registros = list(self.registro.iter_unpack(dados))
+        chunk["n"] = len(registros)
+        if registros:
+            colunas = list(zip(*registros))
+            chunk["t_min"] = colunas[0][0]
+            chunk["t_max"] = colunas[0][-1]
+            chunk["min"] = [min(c) for c in colunas[1:]]
+            chunk["max"] = [max(c) for c in colunas[1:]]
+        self._salvar_indice()
+
+    def _salvar_indice(self):
+        caminho = os.path.join(self.diretorio, ARQUIVO_INDICE)
+        temp = caminho + ".tmp"
+        with open(temp, "w", encoding="utf-8") as f:
+            json.dump(self.indice, f)
+        os.replace(temp, caminho)
+
+    def _novo_chunk(self):
+        if self.f is not None:
+            self.f.close()
+
+        numero = self.indice["chunks"][-1]["numero"] + 1 if self.indice["chunks"] else 0
+        self.atual = {
+            "numero": numero,
+            "arquivo": _nome_chunk(numero),
+            "n": 0,
+            "t_min": None,
+            "t_max": None,
+            "min": [None] * len(self.canais),
+            "max": [None] * len(self.canais),
+        }
+        self.indice["chunks"].append(self.atual)
+
+        self.f = open(os.path.join(self.diretorio, self.atual["arquivo"]), "wb")
+        self.f.write(self.cabecalho)
+
+    def escrever(self, t, valores):
+        """Acrescenta uma amostra (t em segundos epoch, um valor por canal)"""
+        with self.lock:
+            atual = self.atual
+            if atual["n"] >= self.registros_por_chunk or (
+                    atual["t_max"] is not None and t < atual["t_max"]):
+                self._novo_chunk()
+                self._salvar_indice()
+                atual = self.atual
+
+            self.f.write(self.registro.pack(t, *valores))
+
+            if atual["n"] == 0:
+                atual["t_min"] = t
+                atual["min"] = list(valores)
+                atual["max"] = list(valores)
+            else:
+                atual["min"] = [min(a, b) for a, b in zip(atual["min"], valores)]
+                atual["max"] = [max(a, b) for a, b in zip(atual["max"], valores)]
+            atual["t_max"] = t
+            atual["n"] += 1
+
+            if time.monotonic() - self.ultimo_flush >= self.intervalo_flush:
+                self._flush()
+
+    def ultimo_t(self):
+        """Timestamp da última amostra gravada (None se a série está vazia)"""
+        with self.lock:
+            tempos = [c["t_max"] for c in self.indice["chunks"] if c["t_max"] is not None]
+        return max(tempos) if tempos else None
+
+    def _flush(self):
+        self.f.flush()
+        self._salvar_indice()
+        self.ultimo_flush = time.monotonic()
+
+    def flush(self):
+        with self.lock:
+            self._flush()
+
+    def fechar(self):
+        with self.lock:
+            self._flush()
+            self.f.close()
+
+
+class GravadorSerie:
+    """
+    Grava numa EscritorSerie a partir de uma thread própria, como o
+    Historiador: quem chama só enfileira a amostra, e o write do chunk e a
+    regravação do indice.json não atrasam a thread de leitura. compressor
+    (Deadband ou PortaGiratoria, opcional) também roda nessa thread.
+    """
+    def __init__(self, escritor, compressor=None):
+        self.escritor = escritor
+        self.compressor = compressor
+        self.fila = queue.Queue()
+        self.thread = threading.Thread(target=self._rodar, daemon=True)
+        self.thread.start()
+
+    def escrever(self, t, valores):
+        """Enfileira uma amostra; nunca bloqueia quem chama"""
+        self.fila.put((t, tuple(valores)))
+
+    def fechar(self, timeout=2.0):
+        """Grava o que falta na fila (e o pendente do compressor) e fecha a série"""
+        self.fila.put(_FIM)
+        self.thread.join(timeout)
+
+    def _rodar(self):
+        while True:
+            item = self.fila.get()
+            try:
+                if item is _FIM:
+                    if self.compressor is not None:
+                        self._gravar(self.compressor.finalizar())
+                    self.escritor.fechar()
+                    return
+                t, valores = item
+                if self.compressor is None:
+                    self.escritor.escrever(t, valores)
+                else:
+                    self._gravar(self.compressor.adicionar(t, valores))
+            except Exception as e:
+                print(f"[SERIE] Erro ao gravar em {self.escritor.diretorio}: {e}")
+                if item is _FIM:
+                    return
+
+    def _gravar(self, amostras):
+        for t, valores in amostras:
+            self.escritor.escrever(t, valores)
+
+
+class LeitorSerie:
+    """API de leitura: arrays NumPy (memmap) para um intervalo de tempo"""
+    def __init__(self, diretorio):
+        if np is None:
+            raise RuntimeError("LeitorSerie precisa do NumPy (pip install numpy)")
+
+        self.diretorio = diretorio
+        with open(os.path.join(diretorio, ARQUIVO_INDICE), encoding="utf-8") as f:
+            self.indice = json.load(f)
+        self.canais = self.indice["canais"]
+        self.dtype = np.dtype([("t", "<f8")] + [(c, "<f8") for c in self.canais])
+
+    def _memmap(self, arquivo):
+        caminho = os.path.join(self.diretorio, arquivo)
+        canais, tamanho_cabecalho = _ler_cabecalho(caminho)
+        if canais != self.canais:
+            raise ValueError(f"{caminho}: canais diferentes do índice")
+
+        # o número de registros vem do tamanho do arquivo: o índice do chunk
+        # aberto pode estar atrasado em relação ao que já foi gravado
+        n = (os.path.getsize(caminho) - tamanho_cabecalho) // self.dtype.itemsize
+        if n <= 0:
+            return None
+        return np.memmap(caminho, dtype=self.dtype, mode="r",
+                         offset=tamanho_cabecalho, shape=(n,))
+
+    def ler_intervalo(self, t0=None, t1=None):
+        """
+        Amostras com t0 <= t <= t1 como array estruturado (campos "t" e um por
+        canal, ex.: dados["DroneX"]). Com um único chunk o resultado é uma
+        fatia do memmap, sem cópia.
+        """
+        t0 = -np.inf if t0 is None else t0
+        t1 = np.inf if t1 is None else t1
+
+        ultimo = self.indice["chunks"][-1]["arquivo"] if self.indice["chunks"] else None
+        partes = []
+        for chunk in self.indice["chunks"]:
+            if chunk["t_min"] is not None and chunk["t_min"] > t1:
+                continue
+            # o chunk que estava aberto pode ter amostras além do t_max indexado
+            if chunk["arquivo"] != ultimo and (chunk["t_max"] is None or chunk["t_max"] < t0):
+                continue
+
+            mm = self._memmap(chunk["arquivo"])
+            if mm is None:
+                continue
+            i0 = np.searchsorted(mm["t"], t0, side="left")
+            i1 = np.searchsorted(mm["t"], t1, side="right")
+            if i1 > i0:
+                partes.append(mm[i0:i1])
+
+        if not partes:
+            return np.empty(0, dtype=self.dtype)
+        if len(partes) == 1:
+            return partes[0]
+        return np.concatenate(partes)
+
+    def resumo(self):
+        """Índice por chunk (n, t_min, t_max, min/max por canal) sem ler os dados"""
+        return self.indice["chunks"]
@@ -5,8 +5,34 @@ import threading
 import time
 from datetime import datetime
 
+from compressao import PortaGiratoria
+from historiador import Historiador
+from protocolo import LeitorLinhas, LeitorFrames, FRAME_MISSAO, FRAME_TELEMETRIA, enviar_linha
+from serie_temporal import EscritorSerie, GravadorSerie
+
 CLP_HOST = "localhost"
 CLP_PORT = 5000
+PERIODO_STATUS = 0.5
+
+# Modo stream: o CLP empurra a telemetria (SUBSCRIBE) em vez de responder a STATUS
+MODO_STREAM = True
+TAXA_STREAM_HZ = 10
+INTERVALO_LOG_POSICAO = 2.5   # segundos entre registros de posição no historiador
+
+# Telemetria em frames binários (FORMATO BIN) em vez de linhas de texto
+FORMATO_BINARIO = False
+
+# Inspeção completa: MISSION com as bandejas (tolerância em m, dwell em s)
+TOL_MISSAO = 0.1
+DWELL_MISSAO = 2.0
+
+ARQUIVO_HISTORIADOR = "historiador.txt"
+# Cada amostra de posição também vai para a série binária (None desliga)
+SERIE_HISTORIADOR = "historiador_serie"
+# Swinging door na série: só grava os pontos necessários para reconstruir a
+# trajetória a TOLERANCIA_SERIE metros (None grava todas as amostras)
+TOLERANCIA_SERIE = 0.005
+MAX_INTERVALO_SERIE = 60.0    # segundos máximos entre pontos gravados
 
 class Supervisorio:
     def __init__(self, root):
@@ -14,9 +40,24 @@ class Supervisorio:
         self.root.title("Supervisório - Controle de Drone")
         self.root.geometry("900x700")
         self.root.resizable(True, True)
+
+        # Gravação do histórico em thread própria (não bloqueia GUI nem leitura)
+        self.historiador = Historiador(ARQUIVO_HISTORIADOR)
+        # idem para a série binária (compressão incluída)
+        self.serie = None
+        if SERIE_HISTORIADOR:
+            compressor = None
+            if TOLERANCIA_SERIE is not None:
+                compressor = PortaGiratoria(TOLERANCIA_SERIE, MAX_INTERVALO_SERIE)
+            self.serie = GravadorSerie(
+                EscritorSerie(SERIE_HISTORIADOR, ["DroneX", "DroneY", "DroneZ"]), compressor
+            )
         
         # Conexão TCP
         self.socket = None
+        self.leitor = None
+        self.leitor_frames = None
+        self.lock_envio = threading.Lock()
         self.conectado = False
         self.thread_leitura = None
         self.rodando = True
@@ -174,6 +215,14 @@ class Supervisorio:
                   command=lambda: self.enviar_target(0,0,1.5),
                   width=25, height=2, bg="lightyellow").pack(pady=10)
 
+        tk.Button(frame_cmd, text="▶ Inspeção Completa",
+                  command=self.enviar_inspecao_completa,
+                  width=25, height=2, bg="lightgreen").pack(pady=5)
+
+        tk.Button(frame_cmd, text="■ Abortar Missão",
+                  command=lambda: self.enviar_missao("MISSION ABORT"),
+                  width=25, height=1, bg="salmon").pack(pady=5)
+
 
         ###########################################################################
         # LOG
@@ -197,22 +246,14 @@ class Supervisorio:
         self.text_log.insert(tk.END, linha + "\n")
         self.text_log.see(tk.END)
 
-        try:
-            with open("historiador.txt", "a", encoding="utf-8") as f:
-                f.write(linha + "\n")
-        except:
-            pass
+        self.historiador.escrever(linha)
 
 
     def log_posicao_drone(self):
         timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S.%f")[:-3]
         linha = f"[{timestamp}] POSIÇÃO DRONE: X={self.drone_x:.3f}, Y={self.drone_y:.3f}, Z={self.drone_z:.3f}"
 
-        try:
-            with open("historiador.txt", "a", encoding="utf-8") as f:
-                f.write(linha + "\n")
-        except:
-            pass
+        self.historiador.escrever(linha)
 
 
     def limpar_log(self):
@@ -230,8 +271,19 @@ class Supervisorio:
         try:
             self.socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
             self.socket.connect((CLP_HOST, CLP_PORT))
+            self.leitor = LeitorLinhas(self.socket)
+
+            boas = self.leitor.ler_linha()
 
-            boas = self.socket.recv(1024).decode().strip()
+            # negociar o formato logo após o "CLP PRONTO"
+            self.leitor_frames = None
+            if FORMATO_BINARIO:
+                self.enviar_comando("FORMATO BIN")
+                resposta = self.leitor.ler_linha()
+                if resposta == "OK FORMATO BIN":
+                    self.leitor_frames = LeitorFrames(self.socket, self.leitor.buffer)
+                else:
+                    self.log(f"CLP recusou formato binário: {resposta}")
 
             self.conectado = True
             self.label_status.config(text="● CONECTADO", fg="green")
@@ -258,7 +310,7 @@ class Supervisorio:
 
             if self.socket:
                 try:
-                    self.socket.send(b"QUIT\n")
+                    self.enviar_comando("QUIT")
                     time.sleep(0.2)
                 except:
                     pass
@@ -288,19 +340,21 @@ class Supervisorio:
     ###########################################################################
     # TARGET SEND & STATUS THREAD
     ###########################################################################
+    def enviar_comando(self, comando):
+        """Envia uma linha ao CLP; a resposta chega pela thread de leitura"""
+        with self.lock_envio:
+            enviar_linha(self.socket, comando)
+
+
     def enviar_target(self, x, y, z):
         if not self.conectado:
             self.log("Não conectado")
             return
         
         try:
-            comando = f"TARGET {x} {y} {z}\n"
-            self.socket.send(comando.encode())
-
-            resposta = self.socket.recv(1024).decode().strip()
+            self.enviar_comando(f"TARGET {x} {y} {z}")
 
             self.log(f"COMANDO ENVIADO: TARGET X={x:.2f}, Y={y:.2f}, Z={z:.2f}")
-            self.log(f"Resposta: {resposta}")
 
             self.target_x = x
             self.target_y = y
@@ -312,36 +366,64 @@ class Supervisorio:
             self.desconectar()
 
 
-    def thread_ler_status(self):
-        contador = 0
-        
-        if self.socket:
-            self.socket.settimeout(1.0)
+    def enviar_inspecao_completa(self):
+        """Manda as bandejas numa única MISSION; o CLP sequencia sozinho"""
+        coords = " ".join(f"{x} {y} {z}" for _, x, y, z in self.pontos_inspecao)
+        self.enviar_missao(f"MISSION {TOL_MISSAO} {DWELL_MISSAO} {coords}")
 
-        while self.rodando and self.conectado:
-            try:
-                self.socket.send(b"STATUS\n")
-                resposta = self.socket.recv(1024).decode().strip()
 
-                partes = resposta.split()
-                if len(partes) >= 10 and partes[0] == "DRONE":
+    def enviar_missao(self, comando):
+        if not self.conectado:
+            self.log("Não conectado")
+            return
 
-                    self.drone_x = float(partes[1])
-                    self.drone_y = float(partes[2])
-                    self.drone_z = float(partes[3])
+        try:
+            self.enviar_comando(comando)
+            self.log(f"COMANDO ENVIADO: {comando}")
+        except Exception as e:
+            self.log(f"Erro ao enviar: {e}")
+            self.desconectar()
 
-                    if partes[8] == "TIME":
-                        self.ultimo_timestamp = f"{partes[9]} {partes[10]}"
 
-                    self.root.after(0, self.atualizar_display_drone)
-                    self.root.after(0, self.atualizar_timestamp)
+    def thread_ler_status(self):
+        """
+        Única leitora do socket: pede STATUS a cada PERIODO_STATUS (ou assina
+        o stream do CLP no MODO_STREAM) e despacha cada linha recebida
+        (telemetria ou resposta a comando), em ordem.
+        """
+        self.ultimo_log_posicao = 0.0
+        self.ultimo_progresso = None
+        ultimo_status = 0.0
+        
+        if self.socket:
+            self.socket.settimeout(PERIODO_STATUS)
 
-                    contador += 1
-                    if contador >= 5:
-                        self.log_posicao_drone()
-                        contador = 0
+        if MODO_STREAM:
+            try:
+                self.enviar_comando(f"SUBSCRIBE {TAXA_STREAM_HZ}")
+            except Exception as e:
+                print(f"[Thread Leitura] Erro: {e}")
+                return
 
-                time.sleep(0.5)
+        while self.rodando and self.conectado:
+            try:
+                agora = time.monotonic()
+                if not MODO_STREAM and agora - ultimo_status >= PERIODO_STATUS:
+                    self.enviar_comando("STATUS")
+                    ultimo_status = agora
+
+                if self.leitor_frames is not None:
+                    frame = self.leitor_frames.ler_frame()
+                    if frame is None:
+                        break
+                    self.processar_frame(*frame)
+                    continue
+
+                linha = self.leitor.ler_linha()
+                if linha is None:
+                    break
+                if linha:
+                    self.processar_linha(linha)
 
             except socket.timeout:
                 continue
@@ -353,6 +435,62 @@ class Supervisorio:
         print("[Thread Leitura] Encerrada")
 
 
+    def processar_linha(self, linha):
+        partes = linha.split()
+
+        if len(partes) >= 10 and partes[0] == "DRONE":
+            drone = (float(partes[1]), float(partes[2]), float(partes[3]))
+
+            timestamp = None
+            if partes[8] == "TIME":
+                timestamp = f"{partes[9]} {partes[10]}"
+
+            self.atualizar_telemetria(drone, timestamp)
+
+            # ... MISSION <id> <concluídos>/<total> <fase>
+            if "MISSION" in partes[11:]:
+                self.registrar_progresso(" ".join(partes[partes.index("MISSION", 11):]))
+
+        else:
+            # resposta a um comando (OK TARGET, OK SUBSCRIBE, ERRO, TCHAU...)
+            self.root.after(0, self.log, f"Resposta: {linha}")
+
+
+    def processar_frame(self, tipo, valor):
+        if tipo == FRAME_TELEMETRIA:
+            drone, _, t = valor
+            timestamp = datetime.fromtimestamp(t).strftime("%Y-%m-%d %H:%M:%S")
+            self.atualizar_telemetria(drone, timestamp)
+        elif tipo == FRAME_MISSAO:
+            id_missao, concluidos, total, fase = valor
+            self.registrar_progresso(f"MISSION {id_missao} {concluidos}/{total} {fase}")
+        else:
+            self.root.after(0, self.log, f"Resposta: {valor}")
+
+
+    def registrar_progresso(self, progresso):
+        """Loga o progresso da missão só quando muda (texto e binário)"""
+        if progresso != self.ultimo_progresso:
+            self.ultimo_progresso = progresso
+            self.root.after(0, self.log, progresso)
+
+
+    def atualizar_telemetria(self, drone, timestamp):
+        self.drone_x, self.drone_y, self.drone_z = drone
+        if self.serie is not None:
+            self.serie.escrever(time.time(), drone)
+        if timestamp is not None:
+            self.ultimo_timestamp = timestamp
+
+        self.root.after(0, self.atualizar_display_drone)
+        self.root.after(0, self.atualizar_timestamp)
+
+        agora = time.monotonic()
+        if agora - self.ultimo_log_posicao >= INTERVALO_LOG_POSICAO:
+            self.log_posicao_drone()
+            self.ultimo_log_posicao = agora
+
+
     ###########################################################################
     # ATUALIZAÇÃO DO DISPLAY
     ###########################################################################
@@ -376,6 +514,9 @@ class Supervisorio:
     def fechar(self):
         self.rodando = False
         self.desconectar()
+        self.historiador.fechar()
+        if self.serie is not None:
+            self.serie.fechar()
         time.sleep(0.3)
         try:
             self.root.quit()
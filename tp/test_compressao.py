@@ -0,0 +1,54 @@
+"""
+Testes da PortaGiratoria: a interpolação linear entre os pontos gravados
+deve ficar a no máximo a tolerância de cada amostra original.
+
+Uso:
+    python3 -m pytest test_compressao.py
+"""
+
+from compressao import PortaGiratoria
+
+TOL = 0.01
+
+
+def comprimir(porta, amostras):
+    gravados = []
+    for t, v in amostras:
+        gravados += porta.adicionar(t, (v,))
+    return gravados + porta.finalizar()
+
+
+def erro_maximo(gravados, amostras):
+    erro = 0.0
+    for t, v in amostras:
+        for (t0, (v0,)), (t1, (v1,)) in zip(gravados, gravados[1:]):
+            if t0 <= t <= t1:
+                interp = v0 if t1 == t0 else v0 + (v1 - v0) * (t - t0) / (t1 - t0)
+                erro = max(erro, abs(interp - v))
+                break
+        else:
+            raise AssertionError(f"t={t} fora dos pontos gravados")
+    return erro
+
+
+def test_reta_vira_dois_pontos():
+    amostras = [(i * 0.1, 0.5 * i * 0.1) for i in range(200)]
+    gravados = comprimir(PortaGiratoria(TOL), amostras)
+    assert len(gravados) == 2
+    assert erro_maximo(gravados, amostras) <= TOL + 1e-9
+
+
+def test_degrau_no_heartbeat():
+    # degrau 0 -> 1.0 exatamente no instante do heartbeat (t = 60 s)
+    amostras = [(i * 0.1, 0.0 if i < 600 else 1.0) for i in range(700)]
+    gravados = comprimir(PortaGiratoria(TOL, max_intervalo=60.0), amostras)
+    assert erro_maximo(gravados, amostras) <= TOL + 1e-9
+    assert (59.9, (0.0,)) in [(round(t, 6), v) for t, v in gravados]
+
+
+def test_heartbeat_limita_intervalo():
+    amostras = [(i * 0.1, 2.0) for i in range(1000)]
+    gravados = comprimir(PortaGiratoria(TOL, max_intervalo=30.0), amostras)
+    intervalos = [t1 - t0 for (t0, _), (t1, _) in zip(gravados, gravados[1:])]
+    assert max(intervalos) <= 30.0 + 1e-9
+    assert erro_maximo(gravados, amostras) <= TOL + 1e-9
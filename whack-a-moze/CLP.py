@@ -5,82 +5,70 @@ CLP - Cliente OPC UA + Servidor TCP/IP (VERSÃO COM GAME)
 import time
 import socket
 import threading
+from collections import namedtuple
 from datetime import datetime
 from opcua import Client
 
+from protocolo import LeitorLinhas, enviar_linha
+
 OPCUA_URL = "opc.tcp://localhost:53530/OPCUA/SimulationServer"
 TCP_HOST = "0.0.0.0"
 TCP_PORT = 5000
 GAME_HOST = "localhost"
 GAME_PORT = 5001
 
+# Snapshot imutável da memória: seq cresce a cada escrita; seq_target só
+# quando chega um TARGET (é assim que a Thread OPC detecta comando novo)
+Estado = namedtuple("Estado", ["seq", "drone", "target", "seq_target", "game"])
+
 class DadosCompartilhados:
+    """
+    Cada atualização monta um Estado novo e troca uma única referência
+    (atômica no CPython): Thread OPC, Thread TCP e cliente do game leem o
+    snapshot sem lock. O lock só serializa escritores.
+    """
     def __init__(self):
-        self.lock = threading.Lock()
-        
-        # Drone
-        self.drone_x = 0.0
-        self.drone_y = 0.0
-        self.drone_z = 0.0
-        
-        # Target
-        self.target_x = 0.0
-        self.target_y = 0.0
-        self.target_z = 1.5
-        self.novo_comando = False
-        
-        # Game
-        self.game_objeto = "NONE"
-        self.game_pos_x = 0.0
-        self.game_pos_y = 0.0
-        self.game_score = 0
-        self.game_vidas = 3
+        self.lock_escrita = threading.Lock()
+        self.estado = Estado(
+            seq=0,
+            drone=(0.0, 0.0, 0.0),
+            target=(0.0, 0.0, 1.5),
+            seq_target=0,
+            game={"objeto": "NONE", "pos_x": 0.0, "pos_y": 0.0, "score": 0, "vidas": 3},
+        )
         
         # Socket do game (compartilhado)
         self.game_socket = None
+        self.game_leitor = None
         self.game_socket_lock = threading.Lock()
     
     def atualizar_drone(self, x, y, z):
-        with self.lock:
-            self.drone_x = x
-            self.drone_y = y
-            self.drone_z = z
+        with self.lock_escrita:
+            atual = self.estado
+            self.estado = atual._replace(seq=atual.seq + 1, drone=(x, y, z))
     
     def obter_drone(self):
-        with self.lock:
-            return (self.drone_x, self.drone_y, self.drone_z)
+        return self.estado.drone
     
     def definir_target(self, x, y, z):
-        with self.lock:
-            self.target_x = x
-            self.target_y = y
-            self.target_z = z
-            self.novo_comando = True
+        with self.lock_escrita:
+            atual = self.estado
+            self.estado = atual._replace(seq=atual.seq + 1, target=(x, y, z),
+                                         seq_target=atual.seq_target + 1)
     
-    def obter_target(self):
-        with self.lock:
-            target = (self.target_x, self.target_y, self.target_z)
-            tem_novo = self.novo_comando
-            self.novo_comando = False
-            return target, tem_novo
+    def obter_estado(self):
+        """Snapshot atual (sem lock; nunca muda depois de publicado)"""
+        return self.estado
     
     def atualizar_game(self, objeto, pos_x, pos_y, score, vidas):
-        with self.lock:
-            self.game_objeto = objeto
-            self.game_pos_x = pos_x
-            self.game_pos_y = pos_y
-            self.game_score = score
-            self.game_vidas = vidas
+        game = {"objeto": objeto, "pos_x": pos_x, "pos_y": pos_y,
+                "score": score, "vidas": vidas}
+        with self.lock_escrita:
+            atual = self.estado
+            self.estado = atual._replace(seq=atual.seq + 1, game=game)
     
     def obter_game(self):
-        with self.lock:
-            return {
-                "objeto": self.game_objeto,
-                "pos_x": self.game_pos_x,
-                "pos_y": self.game_pos_y,
-                "score": self.game_score,
-                "vidas": self.game_vidas
-            }
+        return dict(self.estado.game)
     
     def conectar_game_socket(self):
         """Conecta ao servidor do game e mantém conexão"""
@@ -90,7 +78,8 @@ class DadosCompartilhados:
                     self.game_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
                     self.game_socket.connect((GAME_HOST, GAME_PORT))
                     self.game_socket.settimeout(2.0)
-                    boas = self.game_socket.recv(1024).decode().strip()
+                    self.game_leitor = LeitorLinhas(self.game_socket)
+                    boas = self.game_leitor.ler_linha()
                     print(f"[GAME-CONN] {boas}")
                     return True
                 except Exception as e:
@@ -106,8 +95,10 @@ class DadosCompartilhados:
                 return "ERRO: não conectado ao game"
             
             try:
-                self.game_socket.send(f"{comando}\n".encode())
-                resposta = self.game_socket.recv(1024).decode().strip()
+                enviar_linha(self.game_socket, comando)
+                resposta = self.game_leitor.ler_linha()
+                if resposta is None:
+                    raise ConnectionError("game fechou a conexão")
                 return resposta
             except Exception as e:
                 print(f"[GAME-CONN] Erro ao enviar comando: {e}")
@@ -200,13 +191,16 @@ def thread_opc(dados, stop_event):
     try:
         clp.connect()
         print("[CLP-OPC] Thread iniciada\n")
+        seq_aplicado = 0
         
         while not stop_event.is_set():
             pos = clp.ler_posicao_drone()
             dados.atualizar_drone(pos[0], pos[1], pos[2])
             
-            target, tem_novo = dados.obter_target()
-            if tem_novo:
+            estado = dados.obter_estado()
+            if estado.seq_target != seq_aplicado:
+                seq_aplicado = estado.seq_target
+                target = estado.target
                 clp.enviar_target(target[0], target[1], target[2])
                 print(f"[CLP-OPC] Target enviado: ({target[0]:.2f}, {target[1]:.2f}, {target[2]:.2f})")
             
@@ -281,20 +275,22 @@ def thread_tcp(dados, stop_event):
                     conn, addr = servidor.accept()
                     print(f"[CLP-TCP] Supervisório conectado: {addr}")
                     conn.sendall(b"CLP PRONTO\n")
+                    leitor = LeitorLinhas(conn)
                 except socket.timeout:
                     continue
             
             try:
                 conn.settimeout(0.5)
-                data = conn.recv(1024)
+                comando = leitor.ler_linha()
                 
-                if not data:
+                if comando is None:
                     print("[CLP-TCP] Supervisório desconectou")
                     conn.close()
                     conn = None
                     continue
                 
-                comando = data.decode('utf-8').strip()
+                if not comando:
+                    continue
                 print(f"[CLP-TCP] Comando: {comando}")
                 
                 partes = comando.split()
@@ -309,9 +305,12 @@ def thread_tcp(dados, stop_event):
                     conn.sendall(resposta.encode('utf-8'))
                 
                 elif partes[0].upper() == "STATUS":
-                    drone_pos = dados.obter_drone()
-                    target_pos, _ = dados.obter_target()
-                    game_info = dados.obter_game()
+                    # um único snapshot: drone, target e game consistentes
+                    # entre si, e a leitura não consome o comando pendente
+                    estado = dados.obter_estado()
+                    drone_pos = estado.drone
+                    target_pos = estado.target
+                    game_info = estado.game
                     timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
                     
                     resposta = (
@@ -0,0 +1,33 @@
+"""
+Protocolo texto CLP <-> Supervisório: um comando/resposta por linha (terminada em \\n).
+
+TCP é um fluxo de bytes: um recv() pode trazer meia linha ou várias linhas
+juntas. LeitorLinhas acumula o que chega e entrega exatamente uma linha por
+chamada, na ordem em que foram enviadas.
+"""
+
+
+class LeitorLinhas:
+    def __init__(self, sock, tamanho_recv=4096):
+        self.sock = sock
+        self.tamanho_recv = tamanho_recv
+        self.buffer = b""
+
+    def ler_linha(self):
+        """
+        Retorna a próxima linha (sem o \\n), ou None se a conexão fechou.
+        socket.timeout é propagado sem perder o que já estava no buffer.
+        """
+        while b"\n" not in self.buffer:
+            data = self.sock.recv(self.tamanho_recv)
+            if not data:
+                return None
+            self.buffer += data
+
+        linha, self.buffer = self.buffer.split(b"\n", 1)
+        return linha.decode('utf-8').strip()
+
+
+def enviar_linha(sock, texto):
+    """Envia texto como uma linha do protocolo"""
+    sock.sendall(f"{texto}\n".encode('utf-8'))
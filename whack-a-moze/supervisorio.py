@@ -5,8 +5,11 @@ import threading
 import time
 from datetime import datetime
 
+from protocolo import LeitorLinhas, enviar_linha
+
 CLP_HOST = "localhost"
 CLP_PORT = 5000
+PERIODO_STATUS = 0.5
 
 class Supervisorio:
     def __init__(self, root):
@@ -17,6 +20,8 @@ class Supervisorio:
         
         # Conexão TCP
         self.socket = None
+        self.leitor = None
+        self.lock_envio = threading.Lock()
         self.conectado = False
         self.thread_leitura = None
         self.rodando = True
@@ -253,8 +258,9 @@ class Supervisorio:
         try:
             self.socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
             self.socket.connect((CLP_HOST, CLP_PORT))
+            self.leitor = LeitorLinhas(self.socket)
 
-            boas = self.socket.recv(1024).decode().strip()
+            boas = self.leitor.ler_linha()
 
             self.conectado = True
             self.label_status.config(text="● CONECTADO", fg="green")
@@ -280,7 +286,7 @@ class Supervisorio:
 
             if self.socket:
                 try:
-                    self.socket.send(b"QUIT\n")
+                    self.enviar_comando("QUIT")
                     time.sleep(0.2)
                 except:
                     pass
@@ -309,19 +315,20 @@ class Supervisorio:
     ###########################################################################
     # TARGET SEND
     ###########################################################################
+    def enviar_comando(self, comando):
+        """Envia uma linha ao CLP; a resposta chega pela thread de leitura"""
+        with self.lock_envio:
+            enviar_linha(self.socket, comando)
+
     def enviar_target(self, x, y, z):
         if not self.conectado:
             self.log("Não conectado")
             return
         
         try:
-            comando = f"TARGET {x} {y} {z}\n"
-            self.socket.send(comando.encode())
-
-            resposta = self.socket.recv(1024).decode().strip()
+            self.enviar_comando(f"TARGET {x} {y} {z}")
 
             self.log(f"COMANDO ENVIADO: TARGET X={x:.2f}, Y={y:.2f}, Z={z:.2f}")
-            self.log(f"Resposta: {resposta}")
 
             self.target_x = x
             self.target_y = y
@@ -341,77 +348,52 @@ class Supervisorio:
             return
         
         try:
-            comando = f"CAPTURAR {nome_objeto}\n"
-            self.socket.send(comando.encode())
-
-            resposta = self.socket.recv(1024).decode().strip()
-            
+            self.enviar_comando(f"CAPTURAR {nome_objeto}")
             self.log(f"CAPTURA: {nome_objeto.upper()}")
-            self.log(f"Resultado: {resposta}")
-
-            # Parse da resposta
-            if resposta.startswith("OK CAPTURADO"):
-                self.log("✓ CAPTURA BEM-SUCEDIDA!")
-            elif "SEM_OBJETO" in resposta:
-                self.log("✗ ERRO: Nenhum objeto ativo!")
-            elif "OBJETO_ERRADO" in resposta:
-                self.log("✗ ERRO: Objeto errado!")
-            elif "LONGE" in resposta:
-                self.log("✗ ERRO: Drone longe do objeto!")
 
         except Exception as e:
             self.log(f"Erro ao capturar: {e}")
             self.desconectar()
 
+    def log_resposta(self, resposta):
+        self.log(f"Resposta: {resposta}")
+
+        # Parse da resposta de captura
+        if resposta.startswith("OK CAPTURADO"):
+            self.log("✓ CAPTURA BEM-SUCEDIDA!")
+        elif "SEM_OBJETO" in resposta:
+            self.log("✗ ERRO: Nenhum objeto ativo!")
+        elif "OBJETO_ERRADO" in resposta:
+            self.log("✗ ERRO: Objeto errado!")
+        elif "LONGE" in resposta:
+            self.log("✗ ERRO: Drone longe do objeto!")
+
     ###########################################################################
     # STATUS THREAD
     ###########################################################################
     def thread_ler_status(self):
-        contador = 0
+        """
+        Única leitora do socket: pede STATUS a cada PERIODO_STATUS e despacha
+        cada linha recebida (telemetria ou resposta a comando), em ordem.
+        """
+        self.contador_log = 0
+        ultimo_status = 0.0
         
         if self.socket:
-            self.socket.settimeout(1.0)
+            self.socket.settimeout(PERIODO_STATUS)
 
         while self.rodando and self.conectado:
             try:
-                self.socket.send(b"STATUS\n")
-                resposta = self.socket.recv(1024).decode().strip()
-
-                partes = resposta.split()
-                if len(partes) >= 10 and partes[0] == "DRONE":
-                    # Parse posição drone
-                    self.drone_x = float(partes[1])
-                    self.drone_y = float(partes[2])
-                    self.drone_z = float(partes[3])
-
-                    # Parse timestamp
-                    if "TIME" in partes:
-                        idx = partes.index("TIME")
-                        self.ultimo_timestamp = f"{partes[idx+1]} {partes[idx+2]}"
-
-                    # Parse game info
-                    for p in partes:
-                        if p.startswith("GAME_OBJ="):
-                            self.game_objeto = p.split('=')[1]
-                        elif p.startswith("GAME_POS="):
-                            pos = p.split('=')[1].split(',')
-                            self.game_pos_x = float(pos[0])
-                            self.game_pos_y = float(pos[1])
-                        elif p.startswith("SCORE="):
-                            self.game_score = int(p.split('=')[1])
-                        elif p.startswith("VIDAS="):
-                            self.game_vidas = int(p.split('=')[1])
-
-                    self.root.after(0, self.atualizar_display_drone)
-                    self.root.after(0, self.atualizar_display_game)
-                    self.root.after(0, self.atualizar_timestamp)
-
-                    contador += 1
-                    if contador >= 5:
-                        self.log_posicao_drone()
-                        contador = 0
-
-                time.sleep(0.5)
+                agora = time.monotonic()
+                if agora - ultimo_status >= PERIODO_STATUS:
+                    self.enviar_comando("STATUS")
+                    ultimo_status = agora
+
+                linha = self.leitor.ler_linha()
+                if linha is None:
+                    break
+                if linha:
+                    self.processar_linha(linha)
 
             except socket.timeout:
                 continue
@@ -422,6 +404,46 @@ class Supervisorio:
         
         print("[Thread Leitura] Encerrada")
 
+    def processar_linha(self, linha):
+        partes = linha.split()
+
+        if len(partes) >= 10 and partes[0] == "DRONE":
+            # Parse posição drone
+            self.drone_x = float(partes[1])
+            self.drone_y = float(partes[2])
+            self.drone_z = float(partes[3])
+
+            # Parse timestamp
+            if "TIME" in partes:
+                idx = partes.index("TIME")
+                self.ultimo_timestamp = f"{partes[idx+1]} {partes[idx+2]}"
+
+            # Parse game info
+            for p in partes:
+                if p.startswith("GAME_OBJ="):
+                    self.game_objeto = p.split('=')[1]
+                elif p.startswith("GAME_POS="):
+                    pos = p.split('=')[1].split(',')
+                    self.game_pos_x = float(pos[0])
+                    self.game_pos_y = float(pos[1])
+                elif p.startswith("SCORE="):
+                    self.game_score = int(p.split('=')[1])
+                elif p.startswith("VIDAS="):
+                    self.game_vidas = int(p.split('=')[1])
+
+            self.root.after(0, self.atualizar_display_drone)
+            self.root.after(0, self.atualizar_display_game)
+            self.root.after(0, self.atualizar_timestamp)
+
+            self.contador_log += 1
+            if self.contador_log >= 5:
+                self.log_posicao_drone()
+                self.contador_log = 0
+
+        else:
+            # resposta a um comando (OK TARGET, CAPTURAR, ERRO, TCHAU...)
+            self.root.after(0, self.log_resposta, linha)
+
     ###########################################################################
     # ATUALIZAÇÃO DO DISPLAY
     ###########################################################################
@@ -4,6 +4,8 @@ import socket
 import threading
 from coppeliasim_zmqremoteapi_client import RemoteAPIClient
 
+from protocolo import LeitorLinhas
+
 ############################
 # CONFIG
 ############################
@@ -160,19 +162,21 @@ def thread_tcp(estado, stop_event, sim):
                     conn, addr = servidor.accept()
                     print(f"[GAME-TCP] Cliente conectado: {addr}")
                     conn.sendall(b"GAME PRONTO\n")
+                    leitor = LeitorLinhas(conn)
                 except socket.timeout:
                     continue
 
             try:
                 conn.settimeout(0.5)
-                data = conn.recv(1024)
+                comando = leitor.ler_linha()
 
-                if not data:
+                if comando is None:
                     conn.close()
                     conn = None
                     continue
 
-                comando = data.decode().strip()
+                if not comando:
+                    continue
                 partes = comando.split()
 
                 if partes[0].upper() == "CAPTURAR" and len(partes) == 5: